@@ -0,0 +1,106 @@
+import os
+import time
+from threading import Thread, Lock, Event
+
+from flask import request
+
+
+CLIENT_IDLE_TTL = float(os.environ.get("CLIENT_IDLE_TTL", 6 * 60 * 60))   # seconds without a request before a client is dropped
+EVICTION_SWEEP_INTERVAL = min(60, CLIENT_IDLE_TTL)
+
+
+# name -> {"states": client dict, "on_evict": callable or None, "evicted": count}
+registries = {}
+registry_lock = Lock()
+sweeper_start_lock = Lock()
+sweeper_started = Event()
+
+
+def register(name, states, on_evict=None):
+    """
+    Track the clients in states (client_id -> dict). on_evict(client_id) is called for
+    idle clients and must drop them itself, returning False if the client turned out to
+    be active again; without it idle entries are simply popped.
+    """
+    with registry_lock:
+        registries[name] = {"states": states, "on_evict": on_evict, "evicted": 0}
+    ensure_sweeper()
+
+
+def touch(states, client_id):
+    """Record activity for client_id if it is known."""
+    entry = states.get(client_id) if client_id else None
+    if isinstance(entry, dict):
+        entry["last_seen"] = time.time()
+
+
+def touch_request(states):
+    """after_request helper: a request naming a client_id (query string or JSON body) counts as activity."""
+    client_id = request.args.get("client_id") or (request.get_json(silent=True) or {}).get("client_id")
+    touch(states, client_id)
+
+
+def is_idle(entry, now=None):
+    """An entry without a last_seen stamp has just been created, so it is not idle."""
+    now = now or time.time()
+    return now - entry.get("last_seen", now) > CLIENT_IDLE_TTL
+
+
+def sweep():
+    """Evict every idle client in every registry. Entries never touched get a grace period from now."""
+    now = time.time()
+    with registry_lock:
+        items = list(registries.items())
+
+    for name, registry in items:
+        states = registry["states"]
+        idle = []
+        for client_id, entry in list(states.items()):
+            if not isinstance(entry, dict):
+                continue
+            entry.setdefault("last_seen", now)
+            if is_idle(entry, now):
+                idle.append(client_id)
+
+        for client_id in idle:
+            try:
+                if registry["on_evict"]:
+                    evicted = registry["on_evict"](client_id)
+                else:
+                    entry = states.get(client_id)
+                    evicted = entry is not None and is_idle(entry) and states.pop(client_id, None) is not None
+            except Exception as e:
+                print(f"❌ Error evicting {name} client {client_id}: {e}")
+                continue
+            if evicted:
+                with registry_lock:
+                    registry["evicted"] += 1
+                print(f"🧹 Evicted idle {name} client {client_id}")
+
+
+def sweeper():
+    while True:
+        time.sleep(EVICTION_SWEEP_INTERVAL)
+        sweep()
+
+
+def ensure_sweeper():
+    if sweeper_started.is_set():
+        return
+    with sweeper_start_lock:
+        if sweeper_started.is_set():
+            return
+        Thread(target=sweeper, daemon=True).start()
+        sweeper_started.set()
+
+
+def eviction_stats():
+    """Per registry: clients currently tracked and clients evicted since startup."""
+    with registry_lock:
+        return {
+            "idle_ttl": CLIENT_IDLE_TTL,
+            "registries": {
+                name: {"clients": len(registry["states"]), "evicted": registry["evicted"]}
+                for name, registry in registries.items()
+            }
+        }
@@ -1,4 +1,4 @@
-import requests
+import upstream
 import time
 import json
 import serial
@@ -63,7 +63,7 @@ except FileNotFoundError:
 
 def fetch_all_shots():
     try:
-        data = requests.get(API_URL).json()
+        data = upstream.get_json(API_URL)
         new_shots = [
             {
                 "playerId": action.get("personId"),
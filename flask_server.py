@@ -1,12 +1,34 @@
 from flask import Flask, send_file, request, jsonify
 from flask import abort
-from nba_handler import nba_bp
+from urllib.parse import urlencode
+from nba_handler import nba_bp, replay_bp, register_websocket
+import client_eviction
 # from nfl_handler import nfl_bp
 
 app = Flask(__name__)
 
 # Track paused state per client_id (can be updated later)
 paused_states = {}
+app.client_states = {}   # client_id -> {"sport": ...}
+
+
+def evict_app_client(client_id):
+    entry = app.client_states.get(client_id)
+    if entry is None or not client_eviction.is_idle(entry):
+        return False
+    app.client_states.pop(client_id, None)
+    paused_states.pop(client_id, None)
+    return True
+
+
+client_eviction.register("app", app.client_states, evict_app_client)
+
+
+@app.after_request
+def touch_client(response):
+    client_eviction.touch_request(app.client_states)
+    return response
+
 
 @app.route("/select_game")
 def select_game_dispatch():
@@ -20,7 +42,11 @@ def select_game_dispatch():
     sport = getattr(app, "client_states", {}).get(client_id, {}).get("sport", "nba")
 
     # Build internal path
-    internal_path = f"/{sport}/select_game?gameId={game_id}&client_id={client_id}"
+    query = {"gameId": game_id, "client_id": client_id}
+    for option in ("format", "fields"):
+        if request.args.get(option):
+            query[option] = request.args[option]
+    internal_path = f"/{sport}/select_game?{urlencode(query)}"
 
     # Forward internally to the correct blueprint view function
     if sport == "nba":
@@ -55,6 +81,8 @@ def current_sport():
 
 # Register blueprints with unique URL prefixes
 app.register_blueprint(nba_bp, url_prefix='/nba')
+app.register_blueprint(replay_bp)   # /games/<date> and /shots/<game_id> at the root
+register_websocket(app, "/nba/ws")   # one thread per open socket: run under gevent for many LED frames
 # app.register_blueprint(nfl_bp, url_prefix='/nfl')
 
 # Serve index.html at root
@@ -23,13 +23,13 @@ export default function PlayerProfile({ route }) {
 
   const playerId = player.personId || player.id || "2544";
 
-  // Fetch player map
+  // Look up just this player's name instead of downloading the whole map
   useEffect(() => {
-    fetch("https://lyvframe.com/nba/player_map?client_id=be3c14f8-c257-48f0-becd-0fa0c367f6aa")
+    fetch(`https://lyvframe.com/nba/players/lookup?ids=${playerId}`)
       .then((res) => res.json())
-      .then((data) => setPlayerNameMap(data))
-      .catch((err) => console.error("Failed to fetch player map:", err));
-  }, []);
+      .then((data) => setPlayerNameMap(data.players || {}))
+      .catch((err) => console.error("Failed to fetch player name:", err));
+  }, [playerId]);
 
   // Fetch player stats for this game
   useEffect(() => {
@@ -0,0 +1,168 @@
+import time
+import json
+import os
+from threading import Lock
+
+from upstream import conditional_get_json, forget, get_json
+
+
+NBA_BOXSCORE_URL = "https://cdn.nba.com/static/json/liveData/boxscore/boxscore_{}.json"
+BOXSCORE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+}
+BOXSCORE_TTL_LIVE = 10           # seconds a live boxscore is served before re-checking the CDN
+BOXSCORE_TTL_SCHEDULED = 60      # seconds for games that haven't tipped off yet
+BOXSCORE_CACHE_DIR = os.path.join(os.path.dirname(__file__), "boxscore_cache")
+GAME_STATUS_LIVE = 2
+GAME_STATUS_FINAL = 3
+
+
+# game_id -> indexed boxscore (see index_boxscore); final games never expire
+boxscore_cache = {}
+boxscore_lock = Lock()
+
+
+def player_summary(p, team_tricode):
+    stats = p.get("statistics", {})
+    return {
+        "name": p.get("name"),
+        "team": team_tricode,
+        "position": p.get("position"),
+        "jerseyNum": p.get("jerseyNum"),
+        "points": stats.get("points", 0),
+        "rebounds": stats.get("reboundsTotal", 0),
+        "assists": stats.get("assists", 0),
+        "steals": stats.get("steals", 0),
+        "blocks": stats.get("blocks", 0),
+        "turnovers": stats.get("turnovers", 0),
+        "fgMade": stats.get("fieldGoalsMade", 0),
+        "fgAttempted": stats.get("fieldGoalsAttempted", 0),
+        "fgPct": stats.get("fieldGoalsPercentage", 0),
+        "threePtMade": stats.get("threePointersMade", 0),
+        "threePtAttempted": stats.get("threePointersAttempted", 0),
+        "threePtPct": stats.get("threePointersPercentage", 0),
+        "ftMade": stats.get("freeThrowsMade", 0),
+        "ftAttempted": stats.get("freeThrowsAttempted", 0),
+        "ftPct": stats.get("freeThrowsPercentage", 0),
+        "minutes": stats.get("minutes", "PT0M0S")
+    }
+
+
+def index_boxscore(data):
+    """
+    Reduce a CDN boxscore document to what the endpoints serve: team tricodes,
+    starters and a personId -> player_stats payload index.
+    """
+    game = data.get("game", {})
+    entry = {
+        "game_status":   game.get("gameStatus"),
+        "players_by_id": {},
+        "fetched_at":    time.time()
+    }
+
+    for side in ("home", "away"):
+        team = game.get(f"{side}Team", {})
+        tricode = team.get("teamTricode", "")
+        players_list = team.get("players", [])
+        if isinstance(players_list, dict):
+            players_list = list(players_list.values())
+
+        starters = []
+        for p in players_list:
+            summary = player_summary(p, tricode)
+            if p.get("personId") is not None:
+                entry["players_by_id"][int(p["personId"])] = summary
+            if p.get("starter") == "1":
+                starters.append({
+                    "name": summary["name"],
+                    "position": summary["position"],
+                    "points": summary["points"],
+                    "rebounds": summary["rebounds"],
+                    "assists": summary["assists"]
+                })
+
+        entry[f"{side}_team"] = tricode
+        entry[f"{side}_starters"] = starters
+
+    return entry
+
+
+def boxscore_path(game_id):
+    return os.path.join(BOXSCORE_CACHE_DIR, f"boxscore_{game_id}.json")
+
+
+def load_final_boxscore(game_id):
+    try:
+        with open(boxscore_path(game_id), "r") as f:
+            return index_boxscore(json.load(f))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading cached boxscore for {game_id}: {e}")
+        return None
+
+
+def save_final_boxscore(game_id, data):
+    try:
+        os.makedirs(BOXSCORE_CACHE_DIR, exist_ok=True)
+        tmp_path = boxscore_path(game_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, boxscore_path(game_id))
+    except Exception as e:
+        print(f"Error saving final boxscore for {game_id}: {e}")
+
+
+def is_fresh(entry):
+    if entry["game_status"] == GAME_STATUS_FINAL:
+        return True
+    ttl = BOXSCORE_TTL_LIVE if entry["game_status"] == GAME_STATUS_LIVE else BOXSCORE_TTL_SCHEDULED
+    return time.time() - entry["fetched_at"] < ttl
+
+
+def get_boxscore(game_id):
+    """
+    Indexed boxscore for game_id. Live games are re-checked with a conditional GET
+    after a short TTL; once a game is final its boxscore is kept in memory and on
+    disk and never fetched again. A failed re-check serves the stale entry;
+    fetch errors are only raised when nothing is cached.
+    """
+    with boxscore_lock:
+        entry = boxscore_cache.get(game_id)
+    if entry and is_fresh(entry):
+        return entry
+
+    if entry is None:
+        entry = load_final_boxscore(game_id)
+        if entry:
+            with boxscore_lock:
+                boxscore_cache[game_id] = entry
+            return entry
+
+    url = NBA_BOXSCORE_URL.format(game_id)
+    if entry is None:
+        forget(url)   # validators without an indexed entry can't be answered from cache
+    try:
+        data, modified = conditional_get_json(url, headers=BOXSCORE_HEADERS)
+    except Exception as e:
+        if entry is None:
+            raise
+        print(f"⚠️ Serving stale boxscore for {game_id}: {e}")
+        return entry
+
+    if not modified and entry is None:
+        # A concurrent caller stored validators after our forget(): nothing cached to
+        # answer the 304 with, so drop them and fetch the body unconditionally.
+        forget(url)
+        data, modified = get_json(url, headers=BOXSCORE_HEADERS), True
+
+    if modified:
+        entry = index_boxscore(data)
+        if entry["game_status"] == GAME_STATUS_FINAL:
+            save_final_boxscore(game_id, data)
+    else:
+        entry = dict(entry, fetched_at=time.time())
+
+    with boxscore_lock:
+        boxscore_cache[game_id] = entry
+    return entry
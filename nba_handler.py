@@ -1,27 +1,52 @@
-from flask import Flask, Blueprint, jsonify, request, send_file
+from flask import Flask, Blueprint, Response, jsonify, request, send_file
 from datetime import datetime, timezone, timedelta
-from threading import Thread, Lock, Event
+from threading import Thread, Lock, Event, Condition
 import requests
 import time
 import logging
 import re
 import json
 import os
+import sys
+import zlib
+import gzip
+import hashlib
+from bisect import bisect_right
 from unidecode import unidecode
 from flask_cors import CORS
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:   # WebSocket push is optional; polling and SSE work without it
+    Sock = None
+    ConnectionClosed = Exception
+try:
+    import msgpack
+except ImportError:   # format=msgpack is only offered when msgpack is installed
+    msgpack = None
+from upstream import conditional_get_json, forget, get_json, single_flight
+import nba_schedule
+from nba_boxscore import get_boxscore, GAME_STATUS_FINAL
+import nba_players
+import client_eviction
+from nba_players import player_id_name_map, normalize_player_name
 from datetime import datetime, timezone, timedelta, date
 from threading import Thread, Lock, Event
 
 
 nba_bp = Blueprint('nba', __name__)
+replay_bp = Blueprint('replay', __name__)   # root-level bulk endpoints used by poller.py / shot_sender.py
 
 
-NBA_SCHEDULE_URL = "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
 NBA_GAME_BASE_URL = "https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{}.json"
+NBA_SCOREBOARD_URL = "https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json"
+FINAL_SHOTS_DIR = os.path.join(os.path.dirname(__file__), "final_shots")
+GAME_STATUS_CHECK_INTERVAL = 60   # seconds between boxscore gameStatus checks while a game is live
 
 
 client_states = {}
-lock = Lock()
+game_states = {}   # game_id -> shared ingest state, fanned out to every subscribed client
+games_lock = Lock()   # guards game_states / client_states membership and subscriber sets only
 paused = False
 pause_lock = Lock()
 live_mode = False
@@ -29,81 +54,28 @@ live_start_time = None
 stop_event = Event()
 
 
-with open(os.path.join(os.path.dirname(__file__), "player_id_name_map.json"), "r") as f:
-    player_id_name_map = json.load(f)
+# cached response bodies: kind -> {"key", "etag", "body", "gzip"}, see cached_artifact()
+artifacts = {}
+artifact_lock = Lock()
 
 
 def load_schedule_for_date_range(start_date_str, end_date_str, schedule_folder=None):
     """
-    Load monthly schedule JSON files for all months covered by start_date_str to end_date_str.
+    Look up games between start_date_str and end_date_str in the local monthly schedule index
+    (parsed once, reloaded when a file changes).
     Returns combined dict with keys as date strings and values as lists of games.
     """
-    if schedule_folder is None:
-        schedule_folder = os.path.join(os.path.dirname(__file__), "schedules")  # adjust if needed
-
-
-    def month_range(start: date, end: date):
-        current = date(start.year, start.month, 1)
-        while current <= end:
-            yield current.year, current.month
-            if current.month == 12:
-                current = date(current.year + 1, 1, 1)
-            else:
-                current = date(current.year, current.month + 1, 1)
-
-
     start_date = date.fromisoformat(start_date_str)
     end_date = date.fromisoformat(end_date_str)
-
-
-    combined_games = {}
-
-
-    for year, month in month_range(start_date, end_date):
-        filename = os.path.join(schedule_folder, f"{year}_{month:02d}.json")
-        if not os.path.exists(filename):
-            print(f"⚠️ Schedule file not found: {filename}, skipping.")
-            continue
-        with open(filename, "r") as f:
-            month_games = json.load(f)
-            # Filter only dates in range
-            for d_str, games_list in month_games.items():
-                d = date.fromisoformat(d_str)
-                if start_date <= d <= end_date:
-                    if d_str not in combined_games:
-                        combined_games[d_str] = []
-                    combined_games[d_str].extend(games_list)
-
-
-    return combined_games
+    return nba_schedule.local_games_in_range(start_date, end_date, schedule_folder)
 
 
 def get_games_from_cdn_schedule(date_str):
     """
-    Fetch games from live NBA CDN schedule API for a given date_str (YYYY-MM-DD).
+    Look up games for a given date_str (YYYY-MM-DD) in the cached NBA CDN schedule.
     Returns a list of game dicts if found, else empty list.
     """
-    try:
-        response = requests.get(NBA_SCHEDULE_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-
-        games = []
-        # The CDN schedule JSON structure has 'league' -> 'standard' -> list of days with games
-        for day in data.get("league", {}).get("standard", []):
-            if day.get("startDateEastern") == date_str:
-                for game in day.get("games", []):
-                    games.append({
-                        "game_id": game.get("gameId"),
-                        "home_team": game.get("hTeam", {}).get("triCode"),
-                        "away_team": game.get("vTeam", {}).get("triCode")
-                    })
-                break
-        return games
-    except Exception as e:
-        print(f"Error fetching live schedule: {e}")
-        return []
+    return nba_schedule.games_on_date(date_str)
 
 
 @nba_bp.route('/')
@@ -174,25 +146,177 @@ def list_games_by_date():
 
 
 def fallback_get_tricodes(game_id):
-    schedule_folder = os.path.join(os.path.dirname(__file__), "schedules")
-    for filename in os.listdir(schedule_folder):
-        if filename.endswith(".json"):
-            filepath = os.path.join(schedule_folder, filename)
-            try:
-                with open(filepath, "r") as f:
-                    monthly_schedule = json.load(f)
-                    for date_str, games_list in monthly_schedule.items():
-                        for g in games_list:
-                            raw_id = str(g.get("game_id", "")).zfill(len(game_id))
-                            if raw_id == game_id:
-                                print(f"[fallback] Found game {game_id} in {filename} with {g.get('away_team')} @ {g.get('home_team')}")
-                                return g.get("home_team"), g.get("away_team")
-            except Exception as e:
-                print(f"Error reading {filepath}: {e}")
+    home, away = nba_schedule.local_teams_for_game(game_id)
+    if home and away:
+        print(f"[fallback] Found game {game_id} in local schedules with {away} @ {home}")
+        return home, away
     print(f"[fallback] Game ID {game_id} not found in any schedule file")
     return None, None
 
 
+def new_game_state(game_id, home_tricode="HOME", away_tricode="AWAY"):
+    """Empty ingest state for one game, as kept in game_states."""
+    return {
+        "game_id":              game_id,
+        "subscribers":          set(),
+        "shot_log":             [],        # append-only; shot index N lives at shot_log[N - 1]
+        "shot_uids":            set(),     # dedupe across polls and rescans
+        "lock":                 Lock(),    # this game's ingest state; shot_log itself is append-only and read lock-free
+        "shots_added":          Condition(),  # long-poll waiters; own lock, never the game or registry lock
+        "on_court_players":     {},
+        "lineups":              {},        # (home ids, away ids) -> Lineup, interned for the whole game
+        "lineup":               None,      # Lineup for on_court_players; None after a substitution
+        "sub_log":              [],
+        "last_action_number":   0,         # highest actionNumber already processed
+        "actions_consumed":     0,         # len(actions) up to and including it
+        "ingested":             False,     # a 200 play-by-play snapshot was applied; finalize_game() requires it
+        "actions_edited":       "",        # newest "edited" stamp among consumed actions, to spot in-place rewrites
+        "home_tricode":         home_tricode,
+        "away_tricode":         away_tricode,
+        "team_basket_side":     {},        # tricode -> basket it shoots at, learned from made shots
+        "final":                False,     # game over: shot_log frozen, worker stopped, see finalize_game()
+        "stop_event":           Event(),
+        "fetch_thread":         None
+    }
+
+
+def subscribe_client(client_id, game_id, home_tricode="HOME", away_tricode="AWAY"):
+    """
+    Attach client_id to the shared ingest state for game_id.
+    The first subscriber starts the game's fetch_shots_loop; later ones just join it,
+    so each game is fetched and parsed once no matter how many clients watch it.
+    A game finalized earlier is loaded from its frozen shot log instead.
+    """
+    frozen = None if game_id in game_states else load_final_game(game_id)
+    with games_lock:
+        game = game_states.get(game_id)
+        start_worker = game is None and frozen is None   # finished games are served from disk, never polled
+        if game is None:
+            game = frozen or new_game_state(game_id, home_tricode, away_tricode)
+            game_states[game_id] = game
+        game["subscribers"].add(client_id)
+
+        if start_worker:
+            thread = Thread(target=fetch_shots_loop, args=(game_id, game, game["stop_event"]), daemon=True)
+            game["fetch_thread"] = thread
+            thread.start()
+            print(f"🏀 Started ingest worker for game {game_id}")
+
+    wake_sockets(lambda other: other == client_id)
+    return game
+
+
+def unsubscribe_client(client_id):
+    """
+    Detach client_id from its current game. When the last subscriber leaves,
+    the game's ingest worker is stopped and its shared state dropped.
+    """
+    client = client_states.get(client_id, {})
+    game_id = client.get("game_id")
+    if not game_id:
+        return
+    client["detached"] = True   # releases long-poll requests still holding this client state
+
+    with games_lock:
+        game = game_states.get(game_id)
+        if not game:
+            return
+        game["subscribers"].discard(client_id)
+        if not game["subscribers"]:
+            game["stop_event"].set()
+            del game_states[game_id]
+            print(f"🛑 Stopped ingest worker for game {game_id} (no subscribers left)")
+
+    wake_waiters(game)
+    wake_sockets(lambda other: other == client_id)
+
+
+def evict_client(client_id):
+    """Drop an idle client: unsubscribe it (stopping its game's worker if it was the last) and forget it."""
+    client = client_states.get(client_id)
+    if client is None or not client_eviction.is_idle(client):
+        return False
+    unsubscribe_client(client_id)
+    with games_lock:
+        client_states.pop(client_id, None)
+    return True
+
+
+client_eviction.register("nba", client_states, evict_client)
+
+
+@nba_bp.after_request
+def touch_client(response):
+    client_eviction.touch_request(client_states)
+    return response
+
+
+@nba_bp.route('/client_stats', methods=['GET'])
+def client_stats():
+    """Tracked clients, evictions since startup and live ingest workers."""
+    stats = client_eviction.eviction_stats()
+    with games_lock:
+        stats["games"] = {game_id: len(game["subscribers"]) for game_id, game in game_states.items()}
+    return jsonify(stats)
+
+
+def get_client_game(client):
+    """Return the shared game state the client is subscribed to, or None."""
+    return game_states.get(client.get("game_id"))
+
+
+def client_lock(client):
+    """The client's own lock, serializing its cursor updates (created on first use for bare states)."""
+    return client.setdefault("lock", Lock())
+
+
+LONG_POLL_MAX_WAIT = 30   # seconds
+
+
+def long_poll_timeout():
+    """Seconds the request asked to block for via ?wait=, clamped to LONG_POLL_MAX_WAIT (0 = don't wait)."""
+    wait = request.args.get("wait", 0, type=float)
+    return max(0.0, min(wait, LONG_POLL_MAX_WAIT))
+
+
+def wake_waiters(game):
+    """Wake every long-poll request and shot socket blocked on this game so it re-checks its client."""
+    if game:
+        with game["shots_added"]:
+            game["shots_added"].notify_all()
+        subscribers = game["subscribers"]
+        wake_sockets(lambda client_id: client_id in subscribers)
+
+
+socket_wakers = {}   # client_id -> {ws: wake callable} for open shot sockets
+socket_wakers_lock = Lock()
+
+
+def wake_sockets(match):
+    """Wake the shot sockets of every client_id for which match(client_id) is true."""
+    with socket_wakers_lock:
+        wakers = [wake for client_id, sockets in socket_wakers.items() if match(client_id) for wake in sockets.values()]
+    for wake in wakers:
+        wake()
+
+
+def wait_for_shot(client, game, cursor, timeout):
+    """
+    Block on the game's condition until the shot log grows past cursor, the client
+    is paused, reset or detached, the game is dropped, or timeout expires.
+    """
+    shots_added = game["shots_added"]
+    with shots_added:
+        return shots_added.wait_for(
+            lambda: len(game["shot_log"]) > cursor
+                    or client.get("paused")
+                    or client.get("just_reset")
+                    or client.get("detached")
+                    or game_states.get(game["game_id"]) is not game,
+            timeout
+        )
+
+
 @nba_bp.route('/select_game', methods=['GET'])
 def select_game():
     game_id   = request.args.get("gameId")
@@ -206,6 +330,13 @@ def select_game():
     # Optional overrides
     home_tri = request.args.get("home_tricode")
     away_tri = request.args.get("away_tricode")
+    shot_format = request.args.get("format")
+    if shot_format and shot_format not in available_shot_formats():
+        return jsonify({"error": f"Unsupported format, use one of {available_shot_formats()}"}), 400
+    try:
+        shot_fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
     # Init default values
@@ -217,22 +348,10 @@ def select_game():
         home_tricode = home_tri.upper()
         away_tricode = away_tri.upper()
     else:
-        try:
-            if game_id.startswith("00224"):
-                resp = requests.get(NBA_SCHEDULE_URL, timeout=10)
-                resp.raise_for_status()
-                schedule_data = resp.json()
-                for day in schedule_data.get("league", {}).get("standard", []):
-                    for g in day.get("games", []):
-                        raw_id = str(g.get("gameId") or g.get("game_id", ""))
-                        if raw_id.zfill(len(game_id)) == game_id:
-                            home_tricode = g["hTeam"]["triCode"]
-                            away_tricode = g["vTeam"]["triCode"]
-                            raise StopIteration
-        except StopIteration:
-            pass
-        except Exception as e:
-            print(f"⚠️ Failed to fetch from CDN: {e}")
+        home, away = nba_schedule.teams_for_game(game_id)
+        if home and away:
+            home_tricode = home
+            away_tricode = away
 
 
     if home_tricode in ["HOME", "", None] or away_tricode in ["AWAY", "", None]:
@@ -245,35 +364,25 @@ def select_game():
             print(f"[LOCAL] Game ID {game_id} not found in local schedules")
 
 
-    if client_id in client_states:
-        old_thread = client_states[client_id]["fetch_thread"]
-        if old_thread and old_thread.is_alive():
-            client_states[client_id]["stop_event"].set()
-            old_thread.join()
-
-
-    stop_event = Event()
+    unsubscribe_client(client_id)
 
 
     # Reset client state, start indexing at 1 here:
     client_states[client_id] = {
         "sport":                "nba",
         "game_id":              game_id,
-        "shots_dict":           {},
-        "order_numbers_sorted": [],
-        "delivered_orders":     set(),
-        "seq_counter":          1,         # <-- start indexing at 1
-        "seq_map":              {},
-        "stop_event":           stop_event,
+        "cursor":               0,         # shots delivered/acked; next shot index is cursor + 1
         "home_tricode":         home_tricode,
         "away_tricode":         away_tricode,
-        "just_reset":           True
+        "format":               shot_format,   # device's preferred shot encoding, see client_format()
+        "fields":               shot_fields,   # registered payload projection, None = every field
+        "lock":                 Lock(),        # cursor updates for this client only
+        "just_reset":           True,
+        "last_seen":            time.time()    # fresh state: not idle even if a sweep already listed this client
     }
 
 
-    new_thread = Thread(target=fetch_shots_loop, args=(client_id, game_id, stop_event), daemon=True)
-    client_states[client_id]["fetch_thread"] = new_thread
-    new_thread.start()
+    subscribe_client(client_id, game_id, home_tricode, away_tricode)
 
 
     return jsonify({
@@ -301,69 +410,47 @@ def select_live_game():
     print(f"🔴 Live mode activated for client {client_id}, game: {game_id}")
 
 
-    # Initialize client if new
-    if client_id not in client_states:
-        client_states[client_id] = {
-            "sport": "nba",
-            "game_id": None,
-            "last_index": -1,
-            "shots_dict": {},
-            "order_numbers_sorted": [],
-            "fetch_thread": None,
-            "delivered_orders": set(),
-            "stop_event": Event(),
-            "home_tricode": "HOME",
-            "away_tricode": "AWAY"
-        }
+    unsubscribe_client(client_id)
 
 
-    # Stop old thread if running
-    old_thread = client_states[client_id]["fetch_thread"]
-    if old_thread and old_thread.is_alive():
-        client_states[client_id]["stop_event"].set()
-        old_thread.join()
+    home_tricode = "HOME"
+    away_tricode = "AWAY"
 
 
     # Fetch and store live game tricodes
     try:
-        scoreboard = requests.get(
-            "https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json",
-            timeout=10
-        ).json()
+        scoreboard, _ = conditional_get_json(NBA_SCOREBOARD_URL, cache_body=True)
         for g in scoreboard.get("scoreboard", {}).get("games", []):
             if g.get("gameId") == game_id:
-                client_states[client_id]["home_tricode"] = g["hTeam"]["triCode"]
-                client_states[client_id]["away_tricode"] = g["vTeam"]["triCode"]
-                print(f"→ [DEBUG] Live tricodes for {client_id}: away_tricode={client_states[client_id]['away_tricode']}, home_tricode={client_states[client_id]['home_tricode']}")
+                home_tricode = g["hTeam"]["triCode"]
+                away_tricode = g["vTeam"]["triCode"]
+                print(f"→ [DEBUG] Live tricodes for {client_id}: away_tricode={away_tricode}, home_tricode={home_tricode}")
                 break
     except Exception as e:
         print(f"⚠️ Could not fetch live game tricodes: {e}")
 
 
     # Reset state
-    client_states[client_id].update({
-        "sport": "nba",
-        "game_id": game_id,
-        "last_index": -1,
-        "shots_dict": {},
-        "order_numbers_sorted": [],
-        "delivered_orders": set()
-    })
+    client_states[client_id] = {
+        "sport":            "nba",
+        "game_id":          game_id,
+        "cursor":           0,
+        "home_tricode":     home_tricode,
+        "away_tricode":     away_tricode,
+        "lock":             Lock(),
+        "paused":           client_states.get(client_id, {}).get("paused", False),
+        "last_seen":        time.time()
+    }
 
 
-    # Start new fetch thread
-    stop_event = client_states[client_id]["stop_event"]
-    stop_event.clear()
-    new_thread = Thread(target=fetch_shots_loop, args=(client_id, game_id, stop_event), daemon=True)
-    client_states[client_id]["fetch_thread"] = new_thread
-    new_thread.start()
+    subscribe_client(client_id, game_id, home_tricode, away_tricode)
 
 
     return jsonify({
         "status": "ok",
         "message": f"Started tracking live game {game_id} for client {client_id}",
-        "homeTeam": client_states[client_id]["home_tricode"],
-        "awayTeam": client_states[client_id]["away_tricode"]
+        "homeTeam": home_tricode,
+        "awayTeam": away_tricode
     })
 
 
@@ -388,6 +475,17 @@ def current_sport():
     return jsonify({"sport": sport})
 
 
+def set_client_paused(client_id, paused):
+    """Pause or resume delivery for client_id and wake anything waiting on its game."""
+    client = client_states.setdefault(client_id, {})
+    client['paused'] = paused
+    wake_waiters(get_client_game(client))
+    if paused:
+        print(f"⏸️ System paused for client {client_id}")
+    else:
+        print(f"▶️ System resumed for client {client_id}")
+
+
 @nba_bp.route('/pause', methods=['POST'])
 def pause():
     data = request.get_json(force=True)
@@ -396,12 +494,7 @@ def pause():
         return jsonify({"error": "Missing client_id"}), 400
 
 
-    if client_id not in client_states:
-        client_states[client_id] = {}
-
-
-    client_states[client_id]['paused'] = True
-    print(f"⏸️ System paused for client {client_id}")
+    set_client_paused(client_id, True)
     return jsonify({"status": "paused"})
 
 
@@ -413,12 +506,7 @@ def resume():
         return jsonify({"error": "Missing client_id"}), 400
 
 
-    if client_id not in client_states:
-        client_states[client_id] = {}
-
-
-    client_states[client_id]['paused'] = False
-    print(f"▶️ System resumed for client {client_id}")
+    set_client_paused(client_id, False)
     return jsonify({"status": "running"})
 
 
@@ -443,10 +531,6 @@ def parse_iso8601_clock(clock_str):
     return "00:00"
 
 
-def normalize_player_name(name: str) -> str:
-    return unidecode(name)
-
-
 def replace_special_chars(s):
     replacements = {
         'ö': 'o',
@@ -463,47 +547,12 @@ def replace_special_chars(s):
 
 
 def fetch_nba_cdn_boxscore(game_id):
-    url = f"https://cdn.nba.com/static/json/liveData/boxscore/boxscore_{game_id}.json"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-    }
-
-
-    resp = requests.get(url, headers=headers, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-
-
-    game = data.get('game', {})
-    home = game.get('homeTeam', {})
-    away = game.get('awayTeam', {})
-
-
-    def extract_starters(team):
-        starters = []
-        players = team.get('players', [])
-        for p in players:
-            if p.get('starter') == '1':
-                stats = p.get('statistics', {})
-                starters.append({
-                    "name": p.get('name'),
-                    "position": p.get('position'),
-                    "points": stats.get('points', 0),
-                    "rebounds": stats.get('reboundsTotal', 0),
-                    "assists": stats.get('assists', 0)
-                })
-        return starters
-
-
-    home_starters = extract_starters(home)
-    away_starters = extract_starters(away)
-
-
+    box = get_boxscore(game_id)
     return {
-        "home_team": home.get('teamTricode', ''),
-        "home_starters": home_starters,
-        "away_team": away.get('teamTricode', ''),
-        "away_starters": away_starters,
+        "home_team": box["home_team"],
+        "home_starters": box["home_starters"],
+        "away_team": box["away_team"],
+        "away_starters": box["away_starters"],
     }
 
 
@@ -531,40 +580,49 @@ def starters():
         return jsonify({"error": "Failed to fetch starters"}), 500
 
 
+def ack_shots(client, to_index, from_index=None):
+    """
+    Ack the client's shots up to to_index. Returns (acked, last_index), or
+    (None, last_index) if from_index starts after the next unacked shot.
+    """
+    game = get_client_game(client)
+    with client_lock(client):
+        cursor = client.get("cursor", 0)
+        # Shot index N is log offset N - 1, so acking is just moving the cursor forward
+        # (never past what has been ingested). A range must start at or before the
+        # next unacked shot, otherwise it would leave a hole the cursor can't represent.
+        if from_index is not None and from_index > cursor + 1:
+            return None, cursor or -1
+        available = len(game["shot_log"]) if game else 0
+        if to_index > cursor:
+            client["cursor"] = min(to_index, available)
+        return client.get("cursor", 0) - cursor, client.get("cursor", 0) or -1
+
+
 @nba_bp.route('/pop_shot', methods=['POST'])
 def pop_shot():
     data = request.get_json()
     client_id = data.get("client_id")
     shot_index = data.get("shot_index")
+    # Optional range ack: {"from_index": a, "to_index": b} acks shots a..b in one request
+    from_index = data.get("from_index")
+    to_index = data.get("to_index", shot_index)
 
 
     if not client_id or client_id not in client_states:
         return jsonify({"error": "Missing or invalid client_id"}), 400
-    if shot_index is None:
+    if to_index is None:
         return jsonify({"error": "Missing shot_index"}), 400
+    if not isinstance(to_index, int) or (from_index is not None and not isinstance(from_index, int)):
+        return jsonify({"error": "shot_index, from_index and to_index must be integers"}), 400
 
 
-    with lock:
-        client = client_states[client_id]
-        current_last = client.get("last_index", -1)
-        if shot_index > current_last:
-            client["last_index"] = shot_index
-
+    acked, last_index = ack_shots(client_states[client_id], to_index, from_index)
+    if acked is None:
+        return jsonify({"error": "Range starts after the next unacked shot", "last_index": last_index}), 409
 
-            # Find UID with seq_map value matching shot_index
-            seq_map = client.get("seq_map", {})
-            uid_to_pop = None
-            for uid, seq in seq_map.items():
-                if seq == shot_index:
-                    uid_to_pop = uid
-                    break
 
-
-            if uid_to_pop:
-                client["delivered_orders"].add(uid_to_pop)
-
-
-    return jsonify({"status": "ok", "last_index": client_states[client_id]["last_index"]})
+    return jsonify({"status": "ok", "last_index": last_index, "acked": acked})
 
 
 @nba_bp.route('/get_active_players', methods=['GET'])
@@ -574,12 +632,133 @@ def get_active_players():
         return jsonify({"error": "Invalid or missing client_id"}), 400
 
 
-    active = client_states[client_id].get("on_court_players", {})
-    return jsonify({ "active_players": { team: sorted(list(players)) for team, players in active.items() } })
+    game = get_client_game(client_states[client_id])
+    with (game["lock"] if game else games_lock):
+        active = game.get("on_court_players", {}) if game else {}
+        active = {team: sorted(list(players)) for team, players in active.items()}
+    return jsonify({ "active_players": active })
+
+def make_artifact(key, body):
+    return {
+        "key":  key,
+        "etag": hashlib.sha1(body).hexdigest()[:16],
+        "body": body,
+        "gzip": gzip.compress(body)
+    }
+
+
+def cached_artifact(kind, key, build):
+    """
+    Serialized response body for kind, rebuilt by build() only when key changes.
+    The body is gzip'd once and its hash doubles as ETag and version.
+    """
+    with artifact_lock:
+        cached = artifacts.get(kind)
+    if cached and cached["key"] == key:
+        return cached
+    artifact = make_artifact(key, build())
+    with artifact_lock:
+        artifacts[kind] = artifact
+    return artifact
+
+
+def artifact_response(artifact, cache_control="no-cache", mimetype="application/json"):
+    """Serve a cached artifact: 304 on a matching If-None-Match, the pre-gzip'd body when accepted."""
+    headers = {"ETag": f'"{artifact["etag"]}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(artifact["etag"]):
+        return Response(status=304, headers=headers)
+    body = artifact["body"]
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = artifact["gzip"]
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+def directory_json(players, complete=True):
+    body = {"count": len(players), "players": players}
+    if not complete:
+        body["complete"] = False
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def player_directory(active=False):
+    """
+    (directory artifact, complete). The active subset is rebuilt only when the set of
+    active ids changes; without nba_api it only covers players seen in boxscores.
+    """
+    if not active:
+        return cached_artifact("players", None, lambda: directory_json(player_id_name_map)), True
+    ids, complete = nba_players.active_player_ids()
+    artifact = cached_artifact("players_active", (ids, complete),
+                               lambda: directory_json(nba_players.active_directory(ids), complete))
+    return artifact, complete
+
+
+PLAYER_DIRECTORY_MAX_AGE = 365 * 24 * 60 * 60   # versioned URLs never change
+PLAYER_LOOKUP_DEFAULT_LIMIT = 10
+PLAYER_LOOKUP_MAX_LIMIT = 50
+
 
 @nba_bp.route("/player_map")
 def player_map():
-    return jsonify(player_id_name_map)
+    return artifact_response(cached_artifact("player_map", None, lambda: json.dumps(player_id_name_map).encode()))
+
+
+@nba_bp.route("/players", methods=['GET'])
+def players_directory():
+    """
+    personId -> name directory, ETag'd and pre-gzip'd. active=1 limits it to current
+    players. The version (also the ETag) is returned in X-Directory-Version;
+    requesting ?v=<version> makes the response cacheable forever. An active subset
+    built without nba_api is partial: "complete": false in the body and
+    X-Directory-Complete: false.
+    """
+    artifact, complete = player_directory(request.args.get("active") in ("1", "true"))
+    if request.args.get("v") == artifact["etag"]:
+        cache_control = f"public, max-age={PLAYER_DIRECTORY_MAX_AGE}, immutable"
+    else:
+        cache_control = "no-cache"
+    response = artifact_response(artifact, cache_control)
+    response.headers["X-Directory-Version"] = artifact["etag"]
+    if not complete:
+        response.headers["X-Directory-Complete"] = "false"
+    return response
+
+
+@nba_bp.route("/players/search", methods=['GET'])
+def players_search():
+    """Type-ahead search: ?q=leb&limit=10 matches full-name and last-name prefixes via the prefix index."""
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"error": "Missing q"}), 400
+    try:
+        limit = min(int(request.args.get("limit", PLAYER_LOOKUP_DEFAULT_LIMIT)), PLAYER_LOOKUP_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    matches = nba_players.lookup_prefix(query, max(limit, 1))
+    return jsonify({"query": query, "players": [{"id": pid, "name": name} for pid, name in matches]})
+
+
+@nba_bp.route("/players/lookup", methods=['GET'])
+def players_lookup():
+    """Targeted directory questions: ?ids=2544,201939 or ?prefix=leb&limit=10."""
+    ids = request.args.get("ids")
+    prefix = request.args.get("prefix")
+    if ids:
+        try:
+            wanted = [int(pid) for pid in ids.split(",") if pid.strip()]
+        except ValueError:
+            return jsonify({"error": "ids must be comma-separated integers"}), 400
+        found, missing = nba_players.lookup_ids(wanted)
+        return jsonify({"players": found, "missing": missing})
+    if prefix:
+        try:
+            limit = min(int(request.args.get("limit", PLAYER_LOOKUP_DEFAULT_LIMIT)), PLAYER_LOOKUP_MAX_LIMIT)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        matches = nba_players.lookup_prefix(prefix, max(limit, 1))
+        return jsonify({"players": [{"id": pid, "name": name} for pid, name in matches]})
+    return jsonify({"error": "Missing ids or prefix"}), 400
 
 @nba_bp.route('/player_stats')
 def player_stats():
@@ -592,54 +771,325 @@ def player_stats():
     player_id_int = int(player_id)
 
     try:
-        url = f"https://cdn.nba.com/static/json/liveData/boxscore/boxscore_{game_id}.json"
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        box = get_boxscore(game_id)
     except Exception as e:
         return jsonify({"error": f"Failed to fetch boxscore: {e}"}), 500
 
-    # Combine all players from both teams
-    all_players = []
-    for team_key in ["homeTeam", "awayTeam"]:
-        team = data.get("game", {}).get(team_key, {})
-        players_list = team.get("players", [])
-        if isinstance(players_list, dict):
-            players_list = list(players_list.values())
-        for p in players_list:
-            p["team"] = team.get("teamTricode")
-            all_players.append(p)
-
-    # Search by personId (correct field)
-    for p in all_players:
-        if p.get("personId") == player_id_int:
-            stats = p.get("statistics", {})
-            return jsonify({
-                "name": p.get("name"),
-                "team": p.get("team"),
-                "position": p.get("position"),
-                "jerseyNum": p.get("jerseyNum"),
-                "points": stats.get("points", 0),
-                "rebounds": stats.get("reboundsTotal", 0),
-                "assists": stats.get("assists", 0),
-                "steals": stats.get("steals", 0),
-                "blocks": stats.get("blocks", 0),
-                "turnovers": stats.get("turnovers", 0),
-                "fgMade": stats.get("fieldGoalsMade", 0),
-                "fgAttempted": stats.get("fieldGoalsAttempted", 0),
-                "fgPct": stats.get("fieldGoalsPercentage", 0),
-                "threePtMade": stats.get("threePointersMade", 0),
-                "threePtAttempted": stats.get("threePointersAttempted", 0),
-                "threePtPct": stats.get("threePointersPercentage", 0),
-                "ftMade": stats.get("freeThrowsMade", 0),
-                "ftAttempted": stats.get("freeThrowsAttempted", 0),
-                "ftPct": stats.get("freeThrowsPercentage", 0),
-                "minutes": stats.get("minutes", "PT0M0S")
-            })
+    # personId -> stats payload is prebuilt when the boxscore is cached
+    player = box["players_by_id"].get(player_id_int)
+    if player:
+        return jsonify(player)
 
     return jsonify({"error": "Player not found in boxscore"}), 404
 
 
+def intern_str(value):
+    """sys.intern() for strings; other values (None, numbers) pass through unchanged."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Lineup:
+    """
+    Both teams' on-court players at some point in a game. Built and serialized once
+    per distinct lineup and shared by every shot taken while it was on the floor.
+    """
+    __slots__ = ("lineup_id", "on_court", "json")
+
+    def __init__(self, lineup_id, home_ids, away_ids):
+        self.lineup_id = lineup_id
+        self.on_court = {
+            "home": sorted(
+                [{"id": pid, "name": intern_str(abbreviate_name(pid_to_name.get(pid, str(pid))))} for pid in home_ids],
+                key=lambda p: p["name"]
+            ),
+            "away": sorted(
+                [{"id": pid, "name": intern_str(abbreviate_name(pid_to_name.get(pid, str(pid))))} for pid in away_ids],
+                key=lambda p: p["name"]
+            )
+        }
+        self.json = json.dumps(self.on_court, separators=(",", ":")).encode()
+
+
+def current_lineup(game, home_tricode, away_tricode):
+    """
+    Lineup for the game's on_court_players, interned: a lineup seen before (players
+    subbed back in) reuses its earlier Lineup and id. Caller holds the game's lock.
+    """
+    lineup = game["lineup"]
+    if lineup is None:
+        on_court = game["on_court_players"]
+        lineup = intern_lineup(game, on_court.get(home_tricode, ()), on_court.get(away_tricode, ()))
+        game["lineup"] = lineup
+    return lineup
+
+
+def intern_lineup(game, home_ids, away_ids):
+    """The game's Lineup for these players, created on first sight."""
+    key = (frozenset(home_ids), frozenset(away_ids))
+    lineup = game["lineups"].get(key)
+    if lineup is None:
+        lineup = Lineup(len(game["lineups"]) + 1, *key)
+        game["lineups"][key] = lineup
+    return lineup
+
+
+class ShotRecord:
+    """One ingested shot shared by every client, with its payload head (no index/onCourt/gameId) pre-serialized."""
+    __slots__ = (
+        "player", "description", "team", "result", "color", "x", "y", "time_actual",
+        "score_home", "score_away", "home_team", "away_team", "clock", "period",
+        "is_three_point", "is_dunk", "lineup", "game_id",
+        "head_json", "encoded", "projections"
+    )
+
+    def __init__(self, player, description, team, result, color, x, y, time_actual, score_home, score_away,
+                 home_team, away_team, clock, period, is_three_point, is_dunk, lineup, game_id):
+        self.player = intern_str(unidecode(player))
+        self.description = intern_str(unidecode(description))
+        self.team = intern_str(team)
+        self.result = intern_str(result)
+        self.color = intern_str(color)
+        self.x = transform_x(x)
+        self.y = transform_y(y)
+        self.time_actual = time_actual
+        self.score_home = intern_str(score_home)
+        self.score_away = intern_str(score_away)
+        self.home_team = intern_str(home_team)
+        self.away_team = intern_str(away_team)
+        self.clock = parse_iso8601_clock(clock) if clock else ""
+        self.period = period
+        self.is_three_point = is_three_point
+        self.is_dunk = is_dunk
+        self.lineup = lineup
+        self.game_id = intern_str(game_id)
+        self.head_json = self.serialize()
+        self.encoded = None       # fmt -> compact encoding, filled on first request
+        self.projections = None   # field tuple -> projected JSON, filled on first request
+
+    @classmethod
+    def from_payload(cls, payload, lineup):
+        """Rebuild a record from its payload, e.g. a line of a frozen shot log."""
+        shot = cls.__new__(cls)
+        for slot, field in PAYLOAD_SLOTS.items():
+            setattr(shot, slot, intern_str(payload[field]))
+        shot.lineup = lineup
+        shot.head_json = shot.serialize()
+        shot.encoded = None
+        shot.projections = None
+        return shot
+
+    def serialize(self):
+        """Payload head JSON: everything before onCourt/gameId, left open (no closing brace)."""
+        head = self.payload()
+        del head["onCourt"], head["gameId"]
+        return json.dumps(head, separators=(",", ":")).encode()[:-1]
+
+    def payload(self):
+        """The next_shot JSON payload (without "index") as a dict."""
+        return {
+            "player":       self.player,
+            "description":  self.description,
+            "team":         self.team,
+            "result":       self.result,
+            "color":        self.color,
+            "x":            self.x,
+            "y":            self.y,
+            "timeActual":   self.time_actual,
+            "scoreHome":    self.score_home,
+            "scoreAway":    self.score_away,
+            "home_team":    self.home_team,
+            "away_team":    self.away_team,
+            "clock":        self.clock,
+            "period":       self.period,
+            "isThreePoint": self.is_three_point,
+            "isDunk":       self.is_dunk,
+            "onCourt":      self.lineup.on_court,
+            "gameId":       self.game_id
+        }
+
+
+# Payload keys in ShotRecord.payload() order; projections are serialized in this order.
+SHOT_FIELDS = (
+    "player", "description", "team", "result", "color", "x", "y", "timeActual",
+    "scoreHome", "scoreAway", "home_team", "away_team", "clock", "period",
+    "isThreePoint", "isDunk", "onCourt", "gameId"
+)
+# ShotRecord value slot -> payload key, for rebuilding records (onCourt comes back as the lineup)
+PAYLOAD_SLOTS = {
+    "player":         "player",
+    "description":    "description",
+    "team":           "team",
+    "result":         "result",
+    "color":          "color",
+    "x":              "x",
+    "y":              "y",
+    "time_actual":    "timeActual",
+    "score_home":     "scoreHome",
+    "score_away":     "scoreAway",
+    "home_team":      "home_team",
+    "away_team":      "away_team",
+    "clock":          "clock",
+    "period":         "period",
+    "is_three_point": "isThreePoint",
+    "is_dunk":        "isDunk",
+    "game_id":        "gameId"
+}
+# Named projections a device can register at select_game instead of listing fields.
+FIELD_PROFILES = {
+    "led":    ("x", "y", "color"),
+    "mobile": ("player", "description", "team", "result", "color", "x", "y", "clock", "period",
+               "scoreHome", "scoreAway", "home_team", "away_team", "onCourt", "gameId"),
+}
+
+
+TAIL_FIELDS = ("onCourt", "gameId")   # last in SHOT_FIELDS; spliced per response, never stored per shot
+PROFILE_FIELD_SETS = frozenset(FIELD_PROFILES.values())
+CUSTOM_PROJECTION_CACHE_SIZE = 4   # ad-hoc fields= lists cached per shot, on top of the profiles
+
+
+def parse_fields(value):
+    """
+    fields= value -> canonical tuple of payload keys, or None for the full payload.
+    Accepts a profile name or a comma-separated list; raises ValueError on unknown fields.
+    """
+    if not value or value == "all":
+        return None
+    if value in FIELD_PROFILES:
+        return FIELD_PROFILES[value]
+    requested = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = requested.difference(SHOT_FIELDS)
+    if unknown or not requested:
+        raise ValueError(f"Unknown fields {sorted(unknown)}, use profiles {list(FIELD_PROFILES)} or any of {list(SHOT_FIELDS)}")
+    return tuple(f for f in SHOT_FIELDS if f in requested)
+
+
+def client_fields(client):
+    """Projection for this request: ?fields= wins over the profile registered at select_game."""
+    if "fields" in request.args:
+        return parse_fields(request.args.get("fields"))
+    return client.get("fields")
+
+
+def projected_head(shot, fields):
+    """
+    Serialized payload head (no onCourt/gameId, no closing brace) for one field set.
+    Cached on the shot per field tuple, so a projection is built once per shot no
+    matter how many devices share it.
+    """
+    if fields is None:
+        return shot.head_json
+    if shot.projections is None:
+        shot.projections = {}
+    body = shot.projections.get(fields)
+    if body is None:
+        payload = shot.payload()
+        body = json.dumps({f: payload[f] for f in fields if f not in TAIL_FIELDS}, separators=(",", ":")).encode()[:-1]
+        # Profiles are always cached; ad-hoc field lists only up to a few per shot
+        if fields in PROFILE_FIELD_SETS or \
+                sum(1 for cached in list(shot.projections) if cached not in PROFILE_FIELD_SETS) < CUSTOM_PROJECTION_CACHE_SIZE:
+            shot.projections[fields] = body
+    return body
+
+
+def shot_json(shot, index, fields=None):
+    """
+    The shot's pre-serialized (optionally projected) payload head with the client's
+    index spliced in front and the lineup's cached JSON and gameId behind.
+    """
+    members = [b'"index":%d' % index]
+    head = projected_head(shot, fields)[1:]
+    if head:
+        members.append(head)
+    if fields is None or "onCourt" in fields:
+        members.append(b'"onCourt":' + shot.lineup.json)
+    if fields is None or "gameId" in fields:
+        members.append(b'"gameId":' + json.dumps(shot.game_id).encode())
+    return b"{" + b",".join(members) + b"}"
+
+
+SHOT_MIMETYPES = {
+    "json":    "application/json",
+    "line":    "text/plain",
+    "msgpack": "application/msgpack",
+}
+LINE_COLORS = {"green": b"G", "red": b"R", "blue": b"B"}
+
+
+def available_shot_formats():
+    return [fmt for fmt in SHOT_MIMETYPES if fmt != "msgpack" or msgpack is not None]
+
+
+def client_format(client):
+    """
+    Shot encoding for this request: ?format= wins, then the format registered at
+    select_game, then an msgpack Accept header, else json. None if unsupported.
+    """
+    fmt = request.args.get("format") or client.get("format")
+    if not fmt:
+        accept = request.headers.get("Accept", "")
+        fmt = "msgpack" if msgpack is not None and "msgpack" in accept else "json"
+    return fmt if fmt in available_shot_formats() else None
+
+
+def score_int(score):
+    try:
+        return int(score)
+    except (TypeError, ValueError):
+        return 0
+
+
+def compact_fields(shot):
+    """The only fields microcontroller formats carry: x, y, color, period, clock, scores."""
+    return shot.x, shot.y, shot.color, shot.period, shot.clock or "00:00", \
+        score_int(shot.score_home), score_int(shot.score_away)
+
+
+def encoded_body(shot, fmt):
+    """
+    Index-free part of a compact encoding, built from the ingest-time record on first
+    use and kept on the shot so every later client reuses it.
+    """
+    if shot.encoded is None:
+        shot.encoded = {}
+    encoded = shot.encoded
+    if fmt not in encoded:
+        x, y, color, period, clock, home, away = compact_fields(shot)
+        if fmt == "line":
+            # fixed width, 30 bytes: "IIIII XX YY C P MM:SS HHH AAA\n" (index prepended per client)
+            encoded[fmt] = b" %02d %02d %s %d %5s %03d %03d\n" % (
+                x, y, LINE_COLORS.get(color, b"?"), period, clock[:5].encode(), home, away)
+        elif fmt == "msgpack":
+            # body of the array [index, x, y, color, period, clock, home, away]
+            encoded[fmt] = b"".join(msgpack.packb(v) for v in (x, y, color, period, clock, home, away))
+    return encoded[fmt]
+
+
+def encode_shot(shot, index, fmt, fields=None):
+    if fmt == "line":
+        return b"%05d" % index + encoded_body(shot, fmt)
+    if fmt == "msgpack":
+        return b"\x98" + msgpack.packb(index) + encoded_body(shot, fmt)   # 0x98 = fixarray of 8
+    return shot_json(shot, index, fields)
+
+
+def shot_response(shot, index, fmt="json", fields=None):
+    return Response(encode_shot(shot, index, fmt, fields), mimetype=SHOT_MIMETYPES[fmt])
+
+
+def control_response(message, fmt="json", status=200):
+    """reset / paused notices in the client's format (a line protocol keyword, or an msgpack map)."""
+    if fmt == "line":
+        keyword = "RESET" if message.get("reset") else "PAUSED"
+        return Response(keyword + "\n", status=status, mimetype=SHOT_MIMETYPES[fmt])
+    if fmt == "msgpack":
+        return Response(msgpack.packb(message), status=status, mimetype=SHOT_MIMETYPES[fmt])
+    return jsonify(message), status
+
+
+def unsupported_format_response():
+    return jsonify({"error": f"Unsupported format, use one of {available_shot_formats()}"}), 400
+
+
 @nba_bp.route('/next_shot', methods=['GET'])
 def next_shot():
     client_id = request.args.get("client_id")
@@ -650,73 +1100,47 @@ def next_shot():
     client = client_states.get(client_id)
     if not client:
         return jsonify({"error":"Invalid client_id"}), 400
+    fmt = client_format(client)
+    if not fmt:
+        return unsupported_format_response()
+    try:
+        fields = client_fields(client)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     if client.get("paused"):
         return '', 204
 
 
     if client.pop("just_reset", False):
-        return jsonify({"reset": True}), 200
+        return control_response({"reset": True}, fmt)
 
 
-    with lock:
-        orders    = client.get("order_numbers_sorted", [])
-        shots     = client.get("shots_dict", {})
-        delivered = client.get("delivered_orders", set())
+    game = get_client_game(client)
+    if not game:
+        return '', 204
 
 
-        if not orders:
+    wait = long_poll_timeout()
+    if wait and client.get("cursor", 0) >= len(game["shot_log"]):
+        wait_for_shot(client, game, client.get("cursor", 0), wait)
+        if client.get("paused"):
             return '', 204
+        if client.pop("just_reset", False):
+            return control_response({"reset": True}, fmt)
 
 
-        next_uid = next((uid for uid in orders if uid not in delivered), None)
-        if next_uid is None:
+    with client_lock(client):
+        cursor = client.get("cursor", 0)
+        if cursor >= len(game["shot_log"]):
             return '', 204
 
 
-        delivered.add(next_uid)
+        shot = game["shot_log"][cursor]
+        client["cursor"] = cursor + 1
+        index = cursor + 1
 
 
-        seq_map = client.setdefault("seq_map", {})
-        if next_uid not in seq_map:
-            seq_map[next_uid] = client.get("seq_counter", 0)
-            client["seq_counter"] = seq_map[next_uid] + 1
-        index = seq_map[next_uid]
-
-
-    shot = shots.get(next_uid)
-    if not shot:
-        return jsonify({"error": "Shot data missing for uid"}), 500
-
-
-    clock  = parse_iso8601_clock(shot.get("clock","")) if shot.get("clock") else ""
-    player = unidecode(shot.get("player",""))
-    desc   = unidecode(shot.get("description",""))
-
-
-    payload = {
-        "index":        index,
-        "player":       player,
-        "description":  desc,
-        "team":         shot["team"],
-        "result":       shot["result"],
-        "color":        shot["color"],
-        "x":            transform_x(shot["x"]),
-        "y":            transform_y(shot["y"]),
-        "timeActual":   shot["timeActual"],
-        "scoreHome":    shot["scoreHome"],
-        "scoreAway":    shot["scoreAway"],
-        "home_team":    client.get("home_tricode"),
-        "away_team":    client.get("away_tricode"),
-        "clock":        clock,
-        "period":       shot["period"],
-        "isThreePoint": shot.get("isThreePoint", False),
-        "isDunk":       shot.get("isDunk", False),
-        "onCourt":      shot.get("onCourt", {"home": [], "away": []}),
-        "gameId":       client.get("gameId")  # ✅ added
-    }
-
-
-    return jsonify(payload)
+    return shot_response(shot, index, fmt, fields)
 
 
 @nba_bp.route('/peek_shot', methods=['GET'])
@@ -734,285 +1158,834 @@ def peek_shot():
     if not client:
         print(f"❌ Invalid client_id: {client_id}")
         return jsonify({"error": "Invalid client_id"}), 400
+    fmt = client_format(client)
+    if not fmt:
+        return unsupported_format_response()
+    try:
+        fields = client_fields(client)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
     if client.get("paused", False):
         print(f"⏸️ Client {client_id} is paused")
-        return jsonify({"paused": True, "message": "Client is paused"}), 200
+        return control_response({"paused": True, "message": "Client is paused"}, fmt)
 
 
     if client.pop("just_reset", False):
         print(f"🔄 Client {client_id} was just reset")
-        return jsonify({"reset": True}), 200
+        return control_response({"reset": True}, fmt)
 
 
-    with lock:
-        orders = client.get("order_numbers_sorted", [])
-        shots = client.get("shots_dict", {})
-        delivered = client.get("delivered_orders", set())
+    game = get_client_game(client)
+    if not game:
+        print(f"📭 No game selected for client {client_id}")
+        return '', 204
 
 
-        if not orders:
-            print(f"📭 No orders for client {client_id}")
-            return '', 204
+    wait = long_poll_timeout()
+    if wait and client.get("cursor", 0) >= len(game["shot_log"]):
+        wait_for_shot(client, game, client.get("cursor", 0), wait)
+        if client.get("paused"):
+            return control_response({"paused": True, "message": "Client is paused"}, fmt)
+        if client.pop("just_reset", False):
+            return control_response({"reset": True}, fmt)
 
 
-        next_uid = next((uid for uid in orders if uid not in delivered), None)
-        if next_uid is None:
-            print(f"✅ All shots delivered for client {client_id}")
-            return '', 204
+    # Read-only: shot_log is append-only, so a cursor below its length always indexes a stable record
+    cursor = client.get("cursor", 0)
+    if cursor >= len(game["shot_log"]):
+        print(f"✅ All shots delivered for client {client_id}")
+        return '', 204
 
 
-        seq_map = client.setdefault("seq_map", {})
-        if next_uid not in seq_map:
-            seq_map[next_uid] = client.get("seq_counter", 0)
-            client["seq_counter"] = seq_map[next_uid] + 1
-        index = seq_map[next_uid]
+    shot = game["shot_log"][cursor]
+    index = cursor + 1
 
 
-        shot = shots.get(next_uid)
-        if not shot:
-            print(f"❌ Shot not found for UID {next_uid} | client: {client_id}")
-            return jsonify({"error": "Shot not found for UID"}), 500
+    print(f"📤 Sending shot to client {client_id} | Player: {shot.player}, Result: {shot.result}, Index: {index}")
 
 
-        home_team = client.get("home_tricode", "HOME")
-        away_team = client.get("away_tricode", "AWAY")
+    return shot_response(shot, index, fmt, fields)
 
 
-    clock  = parse_iso8601_clock(shot.get("clock", "")) if shot.get("clock") else ""
-    player = unidecode(shot.get("player", ""))
-    desc   = unidecode(shot.get("description", ""))
+NEXT_SHOTS_DEFAULT_LIMIT = 100
+NEXT_SHOTS_MAX_LIMIT = 500
 
 
-    print(f"📤 Sending shot to client {client_id} | UID: {next_uid}, Player: {player}, Result: {shot['result']}, Index: {index}")
+@nba_bp.route('/next_shots', methods=['GET'])
+def next_shots():
+    """
+    Batch catch-up: every shot with index > since (default: the client's acked cursor),
+    up to limit, in one response. Doesn't move the cursor; ack with pop_shot
+    {"from_index", "to_index"} and pass next_cursor as since on the following call.
+    """
+    client_id = request.args.get("client_id")
+    if not client_id:
+        return jsonify({"error": "Missing client_id"}), 400
 
 
-    return jsonify({
-        "index":        index,
-        "player":       player,
-        "description":  desc,
-        "team":         shot["team"],
-        "result":       shot["result"],
-        "color":        shot["color"],
-        "x":            transform_x(shot["x"]),
-        "y":            transform_y(shot["y"]),
-        "timeActual":   shot["timeActual"],
-        "scoreHome":    shot["scoreHome"],
-        "scoreAway":    shot["scoreAway"],
-        "clock":        clock,
-        "period":       shot["period"],
-        "home_team":    home_team,
-        "away_team":    away_team,
-        "isThreePoint": shot.get("isThreePoint", False),
-        "onCourt":      shot.get("onCourt", {"home": [], "away": []}),
-        "gameId":       client.get("gameId")  # ✅ added
+    client = client_states.get(client_id)
+    if not client:
+        return jsonify({"error": "Invalid client_id"}), 400
+    fmt = client_format(client)
+    if not fmt:
+        return unsupported_format_response()
+    try:
+        fields = client_fields(client)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if client.get("paused"):
+        return control_response({"paused": True, "message": "Client is paused"}, fmt)
+
+
+    try:
+        since = int(request.args["since"]) if "since" in request.args else None
+        limit = int(request.args.get("limit", NEXT_SHOTS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    limit = max(1, min(limit, NEXT_SHOTS_MAX_LIMIT))
+
+
+    reset = client.pop("just_reset", False)
+    game = get_client_game(client)
+    if not game:
+        return control_response({"reset": True}, fmt) if reset else ('', 204)
+
+
+    if since is None:
+        since = client.get("cursor", 0)
+    since = max(0, since)
+    last_index = len(game["shot_log"])
+    shots = game["shot_log"][since:min(since + limit, last_index)]
+
+
+    if not shots and not reset:
+        return '', 204
+
+
+    meta = {
+        "next_cursor": since + len(shots),
+        "last_index":  last_index,
+        "has_more":    since + len(shots) < last_index
+    }
+    if reset:
+        meta["reset"] = True
+    if game["final"]:
+        meta["final"] = True   # nothing after last_index will ever arrive
+    encoded = [encode_shot(shot, since + i + 1, fmt, fields) for i, shot in enumerate(shots)]
+
+    if fmt == "line":
+        # one fixed-width line per shot, then "NEXT <next_cursor> <last_index>"
+        header = b"RESET\n" if reset else b""
+        body = header + b"".join(encoded) + b"NEXT %05d %05d\n" % (meta["next_cursor"], last_index)
+    elif fmt == "msgpack":
+        # {"shots": [...], **meta}, assembled around the already-packed shot arrays
+        packer = msgpack.Packer()
+        body = packer.pack_map_header(len(meta) + 1) + packer.pack("shots") + packer.pack_array_header(len(encoded)) \
+            + b"".join(encoded) + b"".join(packer.pack(k) + packer.pack(v) for k, v in meta.items())
+    else:
+        body = b'{"shots":[' + b",".join(encoded) + b"]," + json.dumps(meta)[1:].encode()
+    return Response(body, mimetype=SHOT_MIMETYPES[fmt])
+
+
+REPLAY_TTL = 30          # seconds a non-final game ingested for /shots is reused
+REPLAY_CACHE_SIZE = 8    # games without subscribers kept after a /shots download
+replay_games = {}        # game_id -> {"game", "loaded_at"}
+replay_lock = Lock()
+
+
+def load_replay_game(game_id):
+    """
+    Game state to serve /shots from. A game with subscribers is read straight from its
+    live ingest state; any other game has its play-by-play run through ingest_actions
+    once (concurrent downloads share that load) and is kept in replay_games, for
+    REPLAY_TTL seconds unless it is final. Final games come from their frozen shot log.
+    """
+    with games_lock:
+        game = game_states.get(game_id)
+    if game:
+        return game
+    with replay_lock:
+        cached = replay_games.get(game_id)
+    if cached and (cached["game"]["final"] or time.time() - cached["loaded_at"] < REPLAY_TTL):
+        return cached["game"]
+
+
+    def load():
+        game = load_final_game(game_id)
+        if game is None:
+            game = new_game_state(game_id)
+            init_starters(game_id, game)
+            data = get_json(NBA_GAME_BASE_URL.format(game_id))
+            actions = data.get("game", {}).get("actions", [])
+            ingest_actions(game_id, game, actions)
+            if check_if_game_over(game_id, actions) or check_if_game_over(game_id):
+                finalize_game(game_id, game)
+        with replay_lock:
+            replay_games[game_id] = {"game": game, "loaded_at": time.time()}
+            while len(replay_games) > REPLAY_CACHE_SIZE:
+                del replay_games[min(replay_games, key=lambda gid: replay_games[gid]["loaded_at"])]
+        print(f"📼 Loaded {len(game['shot_log'])} shots for replay of game {game_id}")
+        return game
+
+
+    return single_flight(("replay", game_id), load)
+
+
+def gzip_stream(chunks):
+    """gzip-compress an iterable of byte chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+@replay_bp.route('/games/<date_str>', methods=['GET'])
+def games_for_date(date_str):
+    """Games on date_str (YYYY-MM-DD) from the cached CDN schedule, falling back to the local files."""
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "Invalid date format"}), 400
+
+
+    games = get_games_from_cdn_schedule(date_str)
+    if not games:
+        games = load_schedule_for_date_range(date_str, date_str).get(date_str, [])
+
+
+    return jsonify([
+        {
+            "game_id":      nba_schedule.normalize_game_id(g.get("game_id") or g.get("gameId")),
+            "home_team":    g.get("home_team") or g.get("homeTeam"),
+            "away_team":    g.get("away_team") or g.get("awayTeam"),
+            "game_time_et": g.get("game_time_et", "Unknown")
+        }
+        for g in games
+    ])
+
+
+@replay_bp.route('/shots/<game_id>', methods=['GET'])
+def shots_for_game(game_id):
+    """
+    Every shot of a game as newline-delimited JSON, one next_shot payload per line,
+    streamed straight off the shot log (gzip'd when the client accepts it).
+    Optional filters: start / end (inclusive shot indexes), period (e.g. 1,2) and fields=.
+    """
+    game_id = nba_schedule.normalize_game_id(game_id)
+    try:
+        start = max(int(request.args.get("start", 1)), 1)
+        end = int(request.args["end"]) if request.args.get("end") else None
+        periods = {int(p) for p in request.args.get("period", "").split(",") if p.strip()}
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filter: {e}"}), 400
+
+
+    try:
+        game = load_replay_game(game_id)
+    except Exception as e:
+        print(f"❌ Game {game_id} - Error loading shots for replay: {e}")
+        return jsonify({"error": f"No play-by-play available for game {game_id}"}), 404
+
+
+    if game["final"] and start == 1 and end is None and not periods and fields is None:
+        # Whole finished game: the frozen, pre-gzip'd artifact, cacheable forever
+        response = artifact_response(final_shots_artifact(game), FINAL_SHOTS_CACHE_CONTROL, "application/x-ndjson")
+        response.headers["X-Last-Index"] = str(len(game["shot_log"]))
+        return response
+
+
+    shot_log = game["shot_log"]
+    last_index = len(shot_log)   # shots ingested while streaming belong to the next download
+    if end is not None:
+        last_index = min(end, last_index)
+
+
+    def lines():
+        for index in range(start, last_index + 1):
+            shot = shot_log[index - 1]
+            if periods and shot.period not in periods:
+                continue
+            yield shot_json(shot, index, fields) + b"\n"
+
+
+    headers = {"Vary": "Accept-Encoding", "X-Last-Index": str(len(shot_log))}
+    body = lines()
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype="application/x-ndjson", headers=headers)
+
+
+SSE_HEARTBEAT = 15   # seconds between keep-alive comments on an idle stream
+
+
+def client_events(client_id, heartbeat, advance_cursor=True):
+    """watch_client() events, touching the client only after the consumer has taken each one."""
+    for event in watch_client(client_id, heartbeat, advance_cursor):
+        yield event
+        client_eviction.touch(client_states, client_id)
+
+
+def watch_client(client_id, heartbeat, advance_cursor=True):
+    """
+    Yield (event, data, event_id) for the client's new shots, reset/pause/resume changes
+    and a keep-alive after heartbeat idle seconds; advance_cursor moves the cursor like next_shot.
+    """
+    paused = False
+    sent = None   # highest index yielded on this channel
+    watched = None
+    idle_since = None   # when we started waiting without a game
+
+    while True:
+        client = client_states.get(client_id)
+        if client is None:
+            return
+        if client is not watched:
+            # new client state (game re-selected): start over from its cursor
+            watched = client
+            sent = None
+
+        if client.pop("just_reset", False):
+            sent = None
+            yield "reset", {"reset": True}, None
+
+        if bool(client.get("paused")) != paused:
+            paused = bool(client.get("paused"))
+            yield ("paused" if paused else "resumed"), {"paused": paused}, None
+
+        game = get_client_game(client)
+        if game is None:
+            # No game selected yet: nothing to wait on, re-check once a second, and
+            # still write a keep-alive every heartbeat so a dropped channel is noticed
+            idle_since = idle_since or time.time()
+            time.sleep(min(1, heartbeat))
+            if time.time() - idle_since >= heartbeat:
+                idle_since = None
+                yield "keep-alive", None, None
+            continue
+        idle_since = None
+
+        if not paused:
+            with client_lock(client):
+                cursor = client.get("cursor", 0)
+                start = cursor if sent is None else max(cursor, sent)
+                batch = game["shot_log"][start:]
+                if advance_cursor:
+                    client["cursor"] = start + len(batch)
+            for i, shot in enumerate(batch):
+                sent = start + i + 1
+                yield "shot", shot, sent
+
+        shots_added = game["shots_added"]
+        with shots_added:
+            changed = shots_added.wait_for(
+                lambda: client_states.get(client_id) is not client
+                        or client.get("just_reset")
+                        or client.get("detached")
+                        or bool(client.get("paused")) != paused
+                        or (not paused and len(game["shot_log"]) > max(client.get("cursor", 0), sent or 0)),
+                heartbeat
+            )
+        if not changed:
+            yield "keep-alive", None, None
+
+
+def sse_event(event, data, event_id=None):
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    data = data.decode() if isinstance(data, bytes) else json.dumps(data)
+    return message + f"event: {event}\ndata: {data}\n\n"
+
+
+@nba_bp.route('/stream', methods=['GET'])
+def stream_shots():
+    """
+    Server-Sent Events feed for one client: a "shot" event (id = shot index) per new
+    shot, plus "reset", "paused" and "resumed" events. Streamed shots advance the
+    client's cursor like next_shot. Reconnecting with Last-Event-ID resumes after
+    that shot index.
+    """
+    client_id = request.args.get("client_id")
+    if not client_id:
+        return jsonify({"error": "Missing client_id"}), 400
+    if client_id not in client_states:
+        return jsonify({"error": "Invalid client_id"}), 400
+    try:
+        fields = client_fields(client_states[client_id])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if last_event_id and last_event_id.isdigit():
+        client = client_states[client_id]
+        game = get_client_game(client)
+        with client_lock(client):
+            client["cursor"] = min(int(last_event_id), len(game["shot_log"]) if game else 0)
+
+
+    def events():
+        yield "retry: 3000\n\n"
+        for event, data, event_id in client_events(client_id, SSE_HEARTBEAT):
+            if event == "keep-alive":
+                yield ": keep-alive\n\n"
+            elif event == "shot":
+                yield sse_event(event, shot_json(data, event_id, fields), event_id)
+            else:
+                yield sse_event(event, data, event_id)
+
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"   # don't let a reverse proxy buffer the stream
     })
 
 
+WS_HEARTBEAT = 30   # seconds between pings on an idle socket
+SOCKET_WAKE = object()   # handed back by ws.receive() when wake_socket interrupts it
 
 
-def fetch_shots_loop(client_id, game_id, stop_event):
-    import time
-    import requests
+def compact_shot(shot, index):
+    """Small shot message for LED frames: coordinates, color, period, clock and score only."""
+    return {
+        "t": "shot",
+        "i": index,
+        "x": shot.x,
+        "y": shot.y,
+        "c": shot.color,
+        "p": shot.period,
+        "k": shot.clock,
+        "h": shot.score_home,
+        "a": shot.score_away
+    }
 
 
-    def abbreviate_name(name):
-        parts = name.split()
-        if len(parts) == 0:
-            return name
-        first_initial = parts[0][0] + "." if parts[0] else ""
-        last_name = " ".join(parts[1:]) if len(parts) > 1 else ""
-        return f"{first_initial} {last_name}".strip()
+def shot_socket(ws):
+    """
+    WebSocket channel for LED frames (?client_id=): pushes unacked shots, state changes and pings;
+    the device sends ack / pause / resume messages, and acks move the same cursor as /pop_shot.
+    """
+    client_id = request.args.get("client_id")
+    if not client_id or client_id not in client_states:
+        ws.send(json.dumps({"t": "error", "error": "Missing or invalid client_id"}))
+        return
 
+    last_sent = time.time()
 
-    # Mappings
-    name_to_pid = {v: int(k) for k, v in player_id_name_map.items()}
-    pid_to_name = {int(k): v for k, v in player_id_name_map.items()}
-    abbr_to_pid = {abbreviate_name(name): pid for name, pid in name_to_pid.items()}
-    team_basket_side = {}
-    left_basket = (10, 15)
-    right_basket = (38, 15)
-    game_url = f"https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json"
+    def send(message):
+        nonlocal last_sent
+        ws.send(json.dumps(message, separators=(",", ":")))
+        last_sent = time.time()
 
-    with lock:
-        client_states[client_id]["gameId"] = game_id
+    with socket_wakers_lock:
+        socket_wakers.setdefault(client_id, {})[ws] = lambda: wake_socket(ws)
+    try:
+        # heartbeat 0: the generator never blocks, "keep-alive" just means nothing is pending
+        for event, data, index in client_events(client_id, 0, advance_cursor=False):
+            if event == "shot":
+                send(compact_shot(data, index))
+            elif event != "keep-alive":
+                send({"t": event})
+            else:
+                # Idle until the device writes, wake_sockets() fires or a ping is due
+                raw = ws.receive(timeout=max(0, WS_HEARTBEAT - (time.time() - last_sent)))
+                if raw is None:
+                    send({"t": "ping"})
+                elif raw is not SOCKET_WAKE:
+                    handle_socket_message(client_id, raw, send)
+    except ConnectionClosed:
+        pass
+    finally:
+        with socket_wakers_lock:
+            sockets = socket_wakers.get(client_id, {})
+            sockets.pop(ws, None)
+            if not sockets:
+                socket_wakers.pop(client_id, None)
+
+
+def wake_socket(ws):
+    """Make a blocked ws.receive() return SOCKET_WAKE; simple_websocket returns input_buffer items in order."""
+    if SOCKET_WAKE not in ws.input_buffer:
+        ws.input_buffer.append(SOCKET_WAKE)
+    ws.event.set()
+
+
+def handle_socket_message(client_id, raw, send):
+    """Apply one device message (ack / pause / resume) received on a shot socket."""
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        send({"t": "error", "error": "Messages must be JSON"})
+        return
+    if not isinstance(message, dict):
+        send({"t": "error", "error": "Messages must be JSON objects"})
+        return
 
-    # --- Initialize starters ---
+    client = client_states.get(client_id)
+    if client is None:
+        return
+
+    kind = message.get("t")
+    if kind == "ack":
+        to_index = message.get("to", message.get("i"))
+        from_index = message.get("from")
+        if not isinstance(to_index, int) or (from_index is not None and not isinstance(from_index, int)):
+            send({"t": "error", "error": "ack needs integer i (or from/to)"})
+            return
+        acked, last_index = ack_shots(client, to_index, from_index)
+        if acked is None:
+            send({"t": "error", "error": "Range starts after the next unacked shot", "i": last_index})
+        else:
+            send({"t": "acked", "i": last_index})
+    elif kind == "pause":
+        set_client_paused(client_id, True)
+    elif kind == "resume":
+        set_client_paused(client_id, False)
+    else:
+        send({"t": "error", "error": f"Unknown message type {kind!r}"})
+
+
+def register_websocket(app, path="/nba/ws"):
+    """
+    Mount shot_socket on app at path when flask-sock is installed. Each open socket holds
+    a thread, so serve the app under gevent to keep thousands of idle frames on one box.
+    """
+    if Sock is None:
+        print("⚠️ flask-sock not installed, WebSocket push disabled")
+        return None
+    sock = Sock(app)
+    sock.route(path)(shot_socket)
+    return sock
+
+
+def abbreviate_name(name):
+    parts = name.split()
+    if len(parts) == 0:
+        return name
+    first_initial = parts[0][0] + "." if parts[0] else ""
+    last_name = " ".join(parts[1:]) if len(parts) > 1 else ""
+    return f"{first_initial} {last_name}".strip()
+
+
+# Mappings
+name_to_pid = {v: int(k) for k, v in player_id_name_map.items()}
+pid_to_name = {int(k): v for k, v in player_id_name_map.items()}
+left_basket = (10, 15)
+right_basket = (38, 15)
+
+
+def init_starters(game_id, game):
+    """Seed the game's on-court sets and tricodes from the boxscore starters."""
     try:
         starter_info = fetch_nba_cdn_boxscore(game_id)
         home_tricode = starter_info["home_team"]
         away_tricode = starter_info["away_team"]
 
 
-        with lock:
-            client_states[client_id]["home_tricode"] = home_tricode
-            client_states[client_id]["away_tricode"] = away_tricode
-            client_states[client_id]["on_court_players"] = {
+        with game["lock"]:
+            game["home_tricode"] = home_tricode
+            game["away_tricode"] = away_tricode
+            game["on_court_players"] = {
                 home_tricode: set(name_to_pid.get(p["name"]) for p in starter_info["home_starters"] if p["name"] in name_to_pid),
                 away_tricode: set(name_to_pid.get(p["name"]) for p in starter_info["away_starters"] if p["name"] in name_to_pid),
             }
+            game["lineup"] = None
+
+
+        print(f"Initialized starters for game {game_id}: {home_tricode}, {away_tricode}")
+    except Exception as e:
+        print(f"Error fetching starters for game {game_id}: {e}")
+
+
+def ingest_actions(game_id, game, actions):
+    """
+    Apply one play-by-play snapshot to the game state: track substitutions and append
+    new shots to shot_log. Returns the number of shots added. The game's lock is taken
+    once for the whole snapshot, so other games' ingest and every reader of the
+    append-only shot_log proceed without waiting on it.
+    """
+    with game["lock"]:
+        added = apply_actions(game_id, game, actions)
+        game["ingested"] = True
+        return added
+
+
+def ingest_snapshot(game_id, game, data):
+    """ingest_actions for one 200 play-by-play response, waking waiters on new shots. Returns its actions."""
+    actions = data.get("game", {}).get("actions", [])
+    added = ingest_actions(game_id, game, actions)
+    if added:
+        wake_waiters(game)
+        print(f"📅 Game {game_id}: Cached {added} new shots for {len(game['subscribers'])} clients")
+    return actions
+
+
+def newest_edit(actions):
+    """Latest "edited" stamp in actions (ISO 8601, so string order is time order)."""
+    return max((a.get("edited") or "" for a in actions), default="")
 
 
-            client_states[client_id]["shots_dict"] = {}
-            client_states[client_id]["order_numbers_sorted"] = []
-            client_states[client_id]["next_shot_index"] = 1
-            client_states[client_id]["sub_log"] = []
+def apply_actions(game_id, game, actions):
+    """ingest_actions body; the caller holds game["lock"]."""
+    home_tricode = game["home_tricode"]
+    away_tricode = game["away_tricode"]
 
 
-        print(f"Initialized starters for {client_id}: {home_tricode}, {away_tricode}")
+    # Only walk actions newer than the last one processed. If the prefix we
+    # already consumed changed length (deleted/inserted actions) or any of its
+    # actions was edited since, upstream rewrote history: fall back to a full
+    # pass, shot_uid dedupe keeps cached shots from being added twice.
+    start = bisect_right(actions, game["last_action_number"], key=lambda a: a.get("actionNumber", 0))
+    if start != game["actions_consumed"] or newest_edit(actions[:start]) != game["actions_edited"]:
+        if game["actions_consumed"]:
+            print(f"♻️ Game {game_id}: upstream rewrote earlier actions, rescanning all {len(actions)}")
+        start = 0
+
+
+    added = 0
+    for a in actions[start:]:
+        action_type = a.get("actionType")
+        team = a.get("teamTricode", "").strip().upper()
+
+
+        # 🔁 SUBSTITUTION
+        if action_type == "substitution":
+            sub_type  = a.get("subType", "").lower()
+            team      = a.get("teamTricode", "").strip().upper()
+            player_id = a.get("personId")            # ← use this instead of name-looking
+            if not team or sub_type not in ("in", "out") or player_id is None:
+                continue
+
+            on_court = game["on_court_players"].setdefault(team, set())
+
+            if sub_type == "out":
+                on_court.discard(player_id)
+
+            elif sub_type == "in":
+                on_court.add(player_id)
+
+            game["on_court_players"][team] = on_court
+            game["lineup"] = None   # next shot re-resolves the lineup
+
+            # keep a short log for debugging
+            msg = f"SUB {team} {sub_type.upper()}: personId={player_id}"
+            sub_log = game["sub_log"]
+            sub_log.append(msg)
+            if len(sub_log) > 5:
+                sub_log.pop(0)
+            print(f"🔁 {msg}")
+            continue
+
+        # --- SHOT PROCESSING ---
+        result = a.get("shotResult")
+        shooter = a.get("playerNameI") or a.get("playerName")
+        period = a.get("period", 1)
+        if not (result and a.get("timeActual") and shooter and team):
+            continue
+
+
+        is_jump = action_type in ("2pt", "3pt") and "x" in a and "y" in a
+        is_dunk = a.get("subType") == "DUNK" and result == "Made"
+        is_ft = action_type == "freethrow" and result in ("Made", "Missed")
+        if not (is_jump or is_dunk or is_ft):
+            continue
+
+
+        shot_uid = f"{a['timeActual']}_{shooter}_{result}_{period}"
+        if shot_uid in game["shot_uids"]:
+            continue
+
+
+        if is_jump or is_dunk:
+            raw_x = int(round((a["x"] / 100.0) * 47))
+            raw_y = 31 - int(round((a["y"] / 100.0) * 31))
+            led_x, led_y = transform_coordinates(raw_x, raw_y)
+            if result == "Made":
+                if period <= 2:
+                    game["team_basket_side"][team] = right_basket if team == home_tricode else left_basket
+                else:
+                    game["team_basket_side"][team] = left_basket if team == home_tricode else right_basket
+            x, y = led_x, led_y
+            color = "blue" if is_dunk else ("green" if result == "Made" else "red")
+        else:
+            if team in game["team_basket_side"]:
+                x, y = game["team_basket_side"][team]
+            else:
+                cond = (period <= 2 and team == home_tricode) or (period >= 3 and team == away_tricode)
+                x, y = left_basket if cond else right_basket
+            color = "green" if result == "Made" else "red"
+
+
+        lineup = current_lineup(game, home_tricode, away_tricode)
+
+
+        game["shot_uids"].add(shot_uid)
+        # Client payload is built and serialized once here instead of per request
+        shot = ShotRecord(
+            player=shooter,
+            description=a.get("description", ""),
+            team=team,
+            result=result,
+            color=color,
+            x=x, y=y,
+            time_actual=a["timeActual"],
+            score_home=a.get("scoreHome", "N/A"),
+            score_away=a.get("scoreAway", "N/A"),
+            home_team=game.get("home_tricode", "HOME"),
+            away_team=game.get("away_tricode", "AWAY"),
+            clock=a.get("clock", ""),
+            period=period,
+            is_three_point=action_type == "3pt",
+            is_dunk=is_dunk,
+            lineup=lineup,
+            game_id=game_id
+        )
+        game["shot_log"].append(shot)
+        added += 1
+
+
+    if actions:
+        game["last_action_number"] = actions[-1].get("actionNumber", 0)
+        game["actions_consumed"] = len(actions)
+        game["actions_edited"] = newest_edit(actions)
+    return added
+
+
+FINAL_SHOTS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+FINAL_ARTIFACT_CACHE_SIZE = 32   # finished games whose /shots body is kept in memory
+final_artifacts = {}             # game_id -> artifact, oldest first
+final_artifacts_lock = Lock()
+
+
+def final_shots_path(game_id):
+    return os.path.join(FINAL_SHOTS_DIR, f"shots_{game_id}.ndjson")
+
+
+def final_shots_body(shot_log):
+    """The whole game as /shots NDJSON: one payload with its index per line."""
+    return b"".join(shot_json(shot, index) + b"\n" for index, shot in enumerate(shot_log, 1))
+
+
+def final_shots_artifact(game, body=None):
+    """ETag'd, pre-gzip'd /shots body for a final game, from memory or its frozen file."""
+    game_id = game["game_id"]
+    with final_artifacts_lock:
+        artifact = final_artifacts.get(game_id)
+    if artifact is None:
+        artifact = make_artifact(None, body if body is not None else final_shots_body(game["shot_log"]))
+        with final_artifacts_lock:
+            final_artifacts[game_id] = artifact
+            while len(final_artifacts) > FINAL_ARTIFACT_CACHE_SIZE:
+                del final_artifacts[next(iter(final_artifacts))]
+    return artifact
+
+
+def save_final_shots(game_id, body):
+    try:
+        os.makedirs(FINAL_SHOTS_DIR, exist_ok=True)
+        tmp_path = final_shots_path(game_id) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, final_shots_path(game_id))
     except Exception as e:
-        print(f"Error fetching starters for {client_id}: {e}")
-        with lock:
-            client_states[client_id]["on_court_players"] = {}
-            client_states[client_id]["shots_dict"] = {}
-            client_states[client_id]["order_numbers_sorted"] = []
-            client_states[client_id]["next_shot_index"] = 1
-            client_states[client_id]["sub_log"] = []
+        print(f"Error saving final shot log for {game_id}: {e}")
+
+
+def load_final_game(game_id):
+    """Game state rebuilt from a frozen shot log on disk, or None if the game was never finalized."""
+    try:
+        with open(final_shots_path(game_id), "rb") as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading frozen shot log for {game_id}: {e}")
+        return None
+
+    game = new_game_state(game_id)
+    for line in body.splitlines():
+        payload = json.loads(line)
+        on_court = payload["onCourt"]
+        lineup = intern_lineup(game, [p["id"] for p in on_court["home"]], [p["id"] for p in on_court["away"]])
+        game["shot_log"].append(ShotRecord.from_payload(payload, lineup))
+    if game["shot_log"]:
+        game["home_tricode"] = game["shot_log"][0].home_team
+        game["away_tricode"] = game["shot_log"][0].away_team
+    game["final"] = True
+    game["stop_event"].set()
+    final_shots_artifact(game, body)
+    return game
+
+
+def finalize_game(game_id, game):
+    """
+    Game over: freeze the shot log, persist it as the game's immutable /shots
+    artifact and stop the ingest worker. Clients keep reading the frozen log.
+    Refuses (returns False) while no play-by-play snapshot has been ingested, so an
+    empty or never-fetched state is not persisted as the game's permanent record.
+    """
+    with game["lock"]:
+        if game["final"]:
+            return True
+        if not game["ingested"]:
+            print(f"⚠️ Game {game_id} is over but no play-by-play was ingested yet, not freezing")
+            return False
+        game["final"] = True
+    body = final_shots_body(game["shot_log"])
+    save_final_shots(game_id, body)
+    final_shots_artifact(game, body)
+    game["stop_event"].set()
+    wake_waiters(game)
+    print(f"🏁 Game {game_id} is final: froze {len(game['shot_log'])} shots, ingest worker stopped")
+    return True
+
+
+def fetch_shots_loop(game_id, game, stop_event):
+    """
+    Ingest worker for one game. Fetches and parses the play-by-play once per poll
+    and stores shots in the shared game state that every subscribed client reads from.
+    """
+    game_url = NBA_GAME_BASE_URL.format(game_id)
+    forget(game_url)   # fresh game state: first poll must not be answered with a 304
+    init_starters(game_id, game)
 
 
     # --- Main fetch loop ---
+    last_status_check = time.time()
     while not stop_event.is_set():
-        with lock:
-            home_tricode = client_states[client_id]["home_tricode"]
-            away_tricode = client_states[client_id]["away_tricode"]
-            sub_log = client_states[client_id].setdefault("sub_log", [])
+        try:
+            data, modified = conditional_get_json(game_url)
+            game_over = False
+            # 304: nothing happened since the last poll (timeout, review, halftime)
+            if modified:
+                actions = ingest_snapshot(game_id, game, data)
+                game_over = check_if_game_over(game_id, actions)
 
 
-        try:
-            resp = requests.get(game_url, timeout=10)
-            resp.raise_for_status()
-            actions = resp.json().get("game", {}).get("actions", [])
-
-
-            added = 0
-            for a in actions:
-                action_type = a.get("actionType")
-                team = a.get("teamTricode", "").strip().upper()
-
-
-                # 🔁 SUBSTITUTION
-                if action_type == "substitution":
-                    sub_type  = a.get("subType", "").lower()
-                    team      = a.get("teamTricode", "").strip().upper()
-                    player_id = a.get("personId")            # ← use this instead of name-looking
-                    if not team or sub_type not in ("in", "out") or player_id is None:
-                        continue
-
-                    with lock:
-                        on_court = client_states[client_id]["on_court_players"].setdefault(team, set())
-
-                        if sub_type == "out":
-                            on_court.discard(player_id)
-
-                        elif sub_type == "in":
-                            on_court.add(player_id)
-
-                        client_states[client_id]["on_court_players"][team] = on_court
-
-                        # keep a short log for debugging
-                        msg = f"SUB {team} {sub_type.upper()}: personId={player_id}"
-                        sub_log = client_states[client_id].setdefault("sub_log", [])
-                        sub_log.append(msg)
-                        if len(sub_log) > 5:
-                            sub_log.pop(0)
-                        print(f"🔁 {msg}")
-                    continue
-
-                # --- SHOT PROCESSING ---
-                result = a.get("shotResult")
-                shooter = a.get("playerNameI") or a.get("playerName")
-                period = a.get("period", 1)
-                if not (result and a.get("timeActual") and shooter and team):
-                    continue
-
-
-                is_jump = action_type in ("2pt", "3pt") and "x" in a and "y" in a
-                is_dunk = a.get("subType") == "DUNK" and result == "Made"
-                is_ft = action_type == "freethrow" and result in ("Made", "Missed")
-                if not (is_jump or is_dunk or is_ft):
-                    continue
-
-
-                shot_uid = f"{a['timeActual']}_{shooter}_{result}_{period}"
-                with lock:
-                    if shot_uid in client_states[client_id]["shots_dict"]:
-                        continue
-
-
-                if is_jump or is_dunk:
-                    raw_x = int(round((a["x"] / 100.0) * 47))
-                    raw_y = 31 - int(round((a["y"] / 100.0) * 31))
-                    led_x, led_y = transform_coordinates(raw_x, raw_y)
-                    if result == "Made":
-                        if period <= 2:
-                            team_basket_side[team] = right_basket if team == home_tricode else left_basket
-                        else:
-                            team_basket_side[team] = left_basket if team == home_tricode else right_basket
-                    x, y = led_x, led_y
-                    color = "blue" if is_dunk else ("green" if result == "Made" else "red")
-                else:
-                    if team in team_basket_side:
-                        x, y = team_basket_side[team]
-                    else:
-                        cond = (period <= 2 and team == home_tricode) or (period >= 3 and team == away_tricode)
-                        x, y = left_basket if cond else right_basket
-                    color = "green" if result == "Made" else "red"
-
-
-                with lock:
-                    live_on = client_states[client_id]["on_court_players"]
-                on_court_snap = {
-                    "home": sorted(
-                        [{"id": pid, "name": abbreviate_name(pid_to_name.get(pid, str(pid)))} for pid in live_on.get(home_tricode, [])],
-                        key=lambda p: p["name"]
-                    ),
-                    "away": sorted(
-                        [{"id": pid, "name": abbreviate_name(pid_to_name.get(pid, str(pid)))} for pid in live_on.get(away_tricode, [])],
-                        key=lambda p: p["name"]
-                    )
-                }
-
-
-                with lock:
-                    idx = client_states[client_id]["next_shot_index"]
-                    client_states[client_id]["shots_dict"][shot_uid] = {
-                        "x": x, "y": y,
-                        "result": result,
-                        "timeActual": a["timeActual"],
-                        "player": shooter,
-                        "team": team,
-                        "scoreHome": a.get("scoreHome", "N/A"),
-                        "scoreAway": a.get("scoreAway", "N/A"),
-                        "description": a.get("description", ""),
-                        "clock": a.get("clock", ""),
-                        "period": period,
-                        "color": color,
-                        "shot_index": idx,
-                        "isThreePoint": action_type == "3pt",
-                        "isDunk": is_dunk,
-                        "onCourt": on_court_snap,
-                        "gameId": game_id
-                    }
-                    client_states[client_id]["next_shot_index"] += 1
-                    added += 1
-
-
-            if added:
-                with lock:
-                    shots = client_states[client_id]["shots_dict"]
-                    client_states[client_id]["order_numbers_sorted"] = sorted(
-                        shots.keys(),
-                        key=lambda uid: shots[uid]["shot_index"]
-                    )
-                    print(f"📅 Client {client_id}: Cached {added} new shots")
+            # Backstop for a feed that never posts its "game end" action. The boxscore
+            # can go final before the play-by-play catches up, and the last poll may
+            # have been a 304, so take one full snapshot before freezing.
+            if not game_over and time.time() - last_status_check >= GAME_STATUS_CHECK_INTERVAL:
+                last_status_check = time.time()
+                if check_if_game_over(game_id):
+                    forget(game_url)
+                    ingest_snapshot(game_id, game, get_json(game_url))
+                    game_over = True
+
+
+            if game_over and finalize_game(game_id, game):
+                return
 
 
         except Exception as e:
-            print(f"❌ Client {client_id} - Error fetching shots: {e}")
+            print(f"❌ Game {game_id} - Error fetching shots: {e}")
 
 
-        time.sleep(5)
+        stop_event.wait(5)
 
 
 def transform_coordinates(x, y):
@@ -1027,13 +2000,24 @@ def transform_y(y):
     return y
 
 
-def check_if_game_over(game_id):
-    return False
+def check_if_game_over(game_id, actions=None):
+    """
+    True once game_id is final. With play-by-play actions, looks for the closing
+    "game end" action (posted after the last period's end); without them, asks the
+    (cached) boxscore whether gameStatus is final.
+    """
+    if actions is not None:
+        return any(a.get("actionType") == "game" and a.get("subType") == "end" for a in actions[-5:])
+    try:
+        return get_boxscore(game_id)["game_status"] == GAME_STATUS_FINAL
+    except Exception as e:
+        print(f"⚠️ Could not check game status for {game_id}: {e}")
+        return False
 
 
 def get_active_game_id():
     try:
-        scoreboard=requests.get("https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json",timeout=10).json()
+        scoreboard,_=conditional_get_json(NBA_SCOREBOARD_URL,cache_body=True)
         games=scoreboard.get("scoreboard",{}).get("games",[])
         if not games:
             print("⚠️ No games found in scoreboard.")
@@ -1056,6 +2040,8 @@ def get_active_game_id():
 
 app = Flask(__name__)
 app.register_blueprint(nba_bp)
+app.register_blueprint(replay_bp)
+register_websocket(app, "/ws")
 CORS(app)
 
 
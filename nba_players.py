@@ -0,0 +1,148 @@
+import json
+import os
+from bisect import bisect_left
+from threading import Lock
+
+from unidecode import unidecode
+
+try:
+    from nba_api.stats.static import players as nba_static_players
+except ImportError:   # without nba_api the active subset comes from boxscores, marked incomplete
+    nba_static_players = None
+
+import nba_boxscore
+
+
+PLAYER_MAP_PATH = os.path.join(os.path.dirname(__file__), "player_id_name_map.json")
+
+
+with open(PLAYER_MAP_PATH, "r") as f:
+    player_id_name_map = json.load(f)   # "personId" -> full name, every player since 1946
+
+def normalize_player_name(name: str) -> str:
+    return unidecode(name)
+
+
+def build_prefix_index(id_name_map):
+    """
+    Sorted search keys -> personIds for type-ahead. Every player is indexed under
+    their normalized, lowercased full name and under each name part after the
+    first ("james", "abdul-jabbar"), so a prefix lookup is one bisect plus a
+    short forward scan instead of a pass over the whole map.
+    """
+    entries = set()
+    for pid, name in id_name_map.items():
+        key = normalize_player_name(name).lower().strip()
+        if not key:
+            continue
+        entries.add((key, int(pid)))
+        parts = key.split()
+        for i in range(1, len(parts)):
+            entries.add((" ".join(parts[i:]), int(pid)))
+    entries = sorted(entries)
+    return [key for key, _ in entries], [pid for _, pid in entries]
+
+
+# Built once at import; parallel lists so bisect works on plain strings.
+prefix_keys, prefix_ids = build_prefix_index(player_id_name_map)
+
+static_active_ids = None
+static_active_lock = Lock()
+persisted_boxscore_ids = {}   # game_id -> personIds of a final boxscore saved on disk, read once per file
+persisted_boxscore_lock = Lock()
+
+
+def lookup_ids(ids):
+    """personId -> name for every id in ids found in the directory, plus the ids that weren't."""
+    found = {}
+    missing = []
+    for pid in ids:
+        name = player_id_name_map.get(str(pid))
+        if name is None:
+            missing.append(pid)
+        else:
+            found[str(pid)] = name
+    return found, missing
+
+
+def lookup_prefix(prefix, limit):
+    """
+    Up to limit (personId, name) pairs whose full name or last name starts with
+    prefix (accent/case-insensitive), in key order.
+    """
+    prefix = " ".join(normalize_player_name(prefix).lower().split())
+    if not prefix:
+        return []
+    matches = []
+    seen = set()
+    i = bisect_left(prefix_keys, prefix)
+    while i < len(prefix_keys) and prefix_keys[i].startswith(prefix) and len(matches) < limit:
+        pid = prefix_ids[i]
+        if pid not in seen:
+            seen.add(pid)
+            matches.append((pid, player_id_name_map[str(pid)]))
+        i += 1
+    return matches
+
+
+def load_static_active_ids():
+    """Active personIds from nba_api's bundled player list, loaded once; None if nba_api is missing."""
+    global static_active_ids
+    if nba_static_players is None:
+        return None
+    with static_active_lock:
+        if static_active_ids is None:
+            try:
+                static_active_ids = frozenset(p["id"] for p in nba_static_players.get_active_players())
+            except Exception as e:
+                print(f"Error loading active players from nba_api: {e}")
+                return None
+        return static_active_ids
+
+
+def load_persisted_boxscore_ids():
+    """game_id -> personIds for every final boxscore in BOXSCORE_CACHE_DIR, survives restarts."""
+    try:
+        names = os.listdir(nba_boxscore.BOXSCORE_CACHE_DIR)
+    except FileNotFoundError:
+        return {}
+    with persisted_boxscore_lock:
+        for name in names:
+            if not (name.startswith("boxscore_") and name.endswith(".json")):
+                continue
+            game_id = name[len("boxscore_"):-len(".json")]
+            if game_id not in persisted_boxscore_ids:
+                entry = nba_boxscore.load_final_boxscore(game_id)
+                if entry is not None:
+                    persisted_boxscore_ids[game_id] = frozenset(entry["players_by_id"])
+        return dict(persisted_boxscore_ids)
+
+
+def game_season(game_id):
+    """Season digits of a game id ("0022400061" -> "24"), shared by preseason, regular season and playoffs."""
+    return game_id[3:5]
+
+
+def active_player_ids():
+    """
+    (personIds of current players, complete). nba_api's active list when it is installed;
+    otherwise everyone in a boxscore of the latest season this server has seen, cached in
+    memory or saved on disk, which is only the players of games fetched so far, so
+    complete is False.
+    """
+    ids = load_static_active_ids()
+    if ids is not None:
+        return ids, True
+    by_game = load_persisted_boxscore_ids()
+    with nba_boxscore.boxscore_lock:
+        by_game.update((game_id, entry["players_by_id"]) for game_id, entry in nba_boxscore.boxscore_cache.items())
+    if not by_game:
+        return frozenset(), False
+    season = max(game_season(game_id) for game_id in by_game)
+    return frozenset(pid for game_id, pids in by_game.items() if game_season(game_id) == season for pid in pids), False
+
+
+def active_directory(ids=None):
+    """personId -> name restricted to ids (default: active_player_ids())."""
+    ids = active_player_ids()[0] if ids is None else ids
+    return {str(pid): player_id_name_map[str(pid)] for pid in sorted(ids) if str(pid) in player_id_name_map}
@@ -0,0 +1,194 @@
+import time
+import json
+import os
+from datetime import datetime, date, timedelta
+from threading import Thread, Lock, Event
+
+from upstream import conditional_get_json
+
+
+NBA_SCHEDULE_URL = "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
+SCHEDULE_TTL = 6 * 60 * 60       # seconds before the cached schedule is refreshed
+SCHEDULE_RETRY = 60              # seconds before retrying a failed refresh
+SCHEDULE_FOLDER = os.path.join(os.path.dirname(__file__), "schedules")
+
+
+# Parsed once per refresh; the raw multi-MB document is dropped after indexing.
+schedule_cache = {
+    "fetched_at": 0,
+    "by_date":    {},   # "YYYY-MM-DD" -> [{"game_id", "home_team", "away_team", "game_time_et"}]
+    "by_game_id": {},   # "00224xxxxx" -> (home_tricode, away_tricode)
+}
+schedule_lock = Lock()
+refresh_lock = Lock()
+refresher_start_lock = Lock()
+refresher_started = Event()
+
+# schedule folder -> {"signature", "by_date", "by_game_id"} built from the monthly JSON files
+local_schedules = {}
+local_lock = Lock()
+
+
+def normalize_game_id(game_id):
+    return str(game_id or "").zfill(10)
+
+
+def build_schedule_index(data):
+    """
+    Build date -> games and game_id -> (home, away) indexes from the CDN schedule.
+    Handles both scheduleLeagueV2 (leagueSchedule.gameDates) and the legacy
+    league.standard layout.
+    """
+    by_date = {}
+    by_game_id = {}
+
+    for day in data.get("leagueSchedule", {}).get("gameDates", []):
+        try:
+            date_str = datetime.strptime(day.get("gameDate", ""), "%m/%d/%Y %H:%M:%S").strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        for g in day.get("games", []):
+            entry = {
+                "game_id":      normalize_game_id(g.get("gameId")),
+                "home_team":    g.get("homeTeam", {}).get("teamTricode"),
+                "away_team":    g.get("awayTeam", {}).get("teamTricode"),
+                "game_time_et": g.get("gameDateTimeEst") or g.get("gameEt") or "Unknown"
+            }
+            by_date.setdefault(date_str, []).append(entry)
+            by_game_id[entry["game_id"]] = (entry["home_team"], entry["away_team"])
+
+    for day in data.get("league", {}).get("standard", []):
+        date_str = day.get("startDateEastern")
+        for g in day.get("games", []):
+            entry = {
+                "game_id":      normalize_game_id(g.get("gameId")),
+                "home_team":    g.get("hTeam", {}).get("triCode"),
+                "away_team":    g.get("vTeam", {}).get("triCode"),
+                "game_time_et": g.get("startTimeEastern", "Unknown")
+            }
+            if date_str:
+                by_date.setdefault(date_str, []).append(entry)
+            by_game_id[entry["game_id"]] = (entry["home_team"], entry["away_team"])
+
+    return by_date, by_game_id
+
+
+def refresh_schedule():
+    """Re-fetch the CDN schedule (conditionally) and swap in fresh indexes. Returns True on success."""
+    with refresh_lock:
+        try:
+            data, modified = conditional_get_json(NBA_SCHEDULE_URL, timeout=(3.05, 30))
+        except Exception as e:
+            print(f"Error fetching live schedule: {e}")
+            return False
+
+        if modified:
+            by_date, by_game_id = build_schedule_index(data)
+            with schedule_lock:
+                schedule_cache["by_date"] = by_date
+                schedule_cache["by_game_id"] = by_game_id
+            print(f"📆 Schedule cache refreshed: {len(by_game_id)} games on {len(by_date)} dates")
+
+        with schedule_lock:
+            schedule_cache["fetched_at"] = time.time()
+        return True
+
+
+def schedule_refresher(delay):
+    while True:
+        time.sleep(delay)
+        delay = SCHEDULE_TTL if refresh_schedule() else SCHEDULE_RETRY
+
+
+def ensure_schedule():
+    """
+    Make sure the schedule has been loaded. The first caller fetches it synchronously
+    and starts the background refresher; after that readers never touch the network
+    and keep seeing the previous indexes while a refresh is in flight.
+    """
+    if refresher_started.is_set():
+        return
+    with refresher_start_lock:
+        if refresher_started.is_set():
+            return
+        ok = refresh_schedule()
+        Thread(target=schedule_refresher, args=(SCHEDULE_TTL if ok else SCHEDULE_RETRY,), daemon=True).start()
+        refresher_started.set()
+
+
+def games_on_date(date_str):
+    """Games scheduled on date_str (YYYY-MM-DD) according to the CDN schedule, or []."""
+    ensure_schedule()
+    with schedule_lock:
+        return list(schedule_cache["by_date"].get(date_str, []))
+
+
+def teams_for_game(game_id):
+    """(home_tricode, away_tricode) for game_id according to the CDN schedule, or (None, None)."""
+    ensure_schedule()
+    with schedule_lock:
+        return schedule_cache["by_game_id"].get(normalize_game_id(game_id), (None, None))
+
+
+def local_schedule_signature(folder):
+    """(filename, mtime) for every monthly schedule file; changes whenever a file is added or edited."""
+    try:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns)
+            for entry in os.scandir(folder)
+            if entry.name.endswith(".json")
+        ))
+    except FileNotFoundError:
+        return ()
+
+
+def load_local_schedule(folder=None):
+    """
+    Return the date and game_id indexes for the monthly files in folder, parsing them
+    on first use and again only when a file's mtime changes.
+    """
+    folder = folder or SCHEDULE_FOLDER
+    signature = local_schedule_signature(folder)
+
+    with local_lock:
+        cached = local_schedules.get(folder)
+        if cached and cached["signature"] == signature:
+            return cached
+
+        by_date = {}
+        by_game_id = {}
+        for filename, _ in signature:
+            filepath = os.path.join(folder, filename)
+            try:
+                with open(filepath, "r") as f:
+                    monthly_schedule = json.load(f)
+            except Exception as e:
+                print(f"Error reading {filepath}: {e}")
+                continue
+            for date_str, games_list in monthly_schedule.items():
+                by_date.setdefault(date_str, []).extend(games_list)
+                for g in games_list:
+                    by_game_id[normalize_game_id(g.get("game_id"))] = (g.get("home_team"), g.get("away_team"))
+
+        cached = {"signature": signature, "by_date": by_date, "by_game_id": by_game_id}
+        local_schedules[folder] = cached
+        print(f"📁 Loaded local schedules: {len(by_game_id)} games from {len(signature)} files")
+        return cached
+
+
+def local_games_in_range(start_date, end_date, folder=None):
+    """date_str -> games from the local schedule files for every date in [start_date, end_date]."""
+    by_date = load_local_schedule(folder)["by_date"]
+    games = {}
+    d = start_date
+    while d <= end_date:
+        date_str = d.isoformat()
+        if date_str in by_date:
+            games[date_str] = list(by_date[date_str])
+        d += timedelta(days=1)
+    return games
+
+
+def local_teams_for_game(game_id, folder=None):
+    """(home_tricode, away_tricode) for game_id from the local schedule files, or (None, None)."""
+    return load_local_schedule(folder)["by_game_id"].get(normalize_game_id(game_id), (None, None))
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-import requests
+import upstream
 from threading import Lock
 import logging
+import client_eviction
 
 nfl_bp = Blueprint("nfl", __name__, url_prefix="/nfl")
 logging.basicConfig(level=logging.DEBUG)
@@ -11,6 +12,14 @@ API_BASE = "https://sports.core.api.espn.com/v2/sports/football/leagues/nfl"
 # Single shared state for all clients
 client_states = {}
 client_lock = Lock()
+client_eviction.register("nfl", client_states)
+
+
+@nfl_bp.after_request
+def touch_client(response):
+    client_eviction.touch_request(client_states)
+    return response
+
 
 def reset_client_for_new_game(client_id, client_states):
     """
@@ -56,7 +65,7 @@ def get_nfl_games():
 
     url = f"https://site.api.espn.com/apis/site/v2/sports/football/nfl/scoreboard?dates={espn_date}"
     try:
-        resp = requests.get(url)
+        resp = upstream.get(url)
         resp.raise_for_status()
         data = resp.json()
     except Exception as e:
@@ -86,7 +95,7 @@ def select_game():
         return jsonify(error="Missing gameId or client_id"), 400
 
     url = f"{API_BASE}/events/{game_id}/competitions/{game_id}/plays?limit=500"
-    resp = requests.get(url)
+    resp = upstream.get(url)
     if resp.status_code != 200:
         return jsonify(error="Failed to fetch plays", status=resp.status_code), resp.status_code
 
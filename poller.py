@@ -1,4 +1,5 @@
 import requests
+import json
 import serial
 import time
 from datetime import datetime
@@ -9,8 +10,8 @@ BAUD_RATE = 115200
 
 LED_WIDTH = 32
 LED_HEIGHT = 16
-COURT_WIDTH = 94.0
-COURT_HEIGHT = 50.0
+COURT_WIDTH = 47.0   # /shots coordinates: full court scaled to 0-47 x 0-31
+COURT_HEIGHT = 31.0
 
 def map_shot_coordinates(shot, is_home_team):
     period = shot.get('period', 1)
@@ -63,12 +64,13 @@ def main():
     home_team = game["home_team"]
     away_team = game["away_team"]
 
-    shots_resp = requests.get(f"{BASE_URL}/shots/{game_id}")
+    shots_resp = requests.get(f"{BASE_URL}/shots/{game_id}", stream=True)
     if shots_resp.status_code != 200:
         print("Error fetching shots:", shots_resp.text)
         return
 
-    shots = shots_resp.json()
+    # Newline-delimited JSON, one shot per line
+    shots = [json.loads(line) for line in shots_resp.iter_lines() if line]
     print(f"\nLoaded {len(shots)} shots for game {game_id}")
     print("Opening serial...")
 
@@ -82,8 +84,7 @@ def main():
     print("Sending shots to Arduino...")
 
     for shot in shots:
-        # TEMP FIX: Team info not in shot dict, so skip home/away logic
-        is_home = False  # <- Change this later when 'team' is available
+        is_home = shot.get('team') == home_team
 
         send_shot_to_arduino(ser, shot, is_home)
         print(f"{shot['timeActual']} - {shot['player']} - {shot['result']} at ({shot['x']:.1f}, {shot['y']:.1f})")
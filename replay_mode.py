@@ -1,5 +1,5 @@
 import time
-import requests
+import upstream
 import serial
 from datetime import datetime
 
@@ -14,9 +14,7 @@ def get_nba_games_by_date(date_str):
         target_date = datetime.strptime(date_str, "%Y-%m-%d")
         target_date_str = target_date.strftime("%m/%d/%Y 00:00:00")
 
-        response = requests.get("https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json")
-        response.raise_for_status()
-        data = response.json()
+        data = upstream.get_json("https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json")
 
         schedule = data.get("leagueSchedule", {}).get("gameDates", [])
         available_dates = [d["gameDate"] for d in schedule]
@@ -60,8 +58,7 @@ def replay_game(game_id):
     url = f"https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json"
     print(f"\nFetching play-by-play from: {url}")
     try:
-        resp = requests.get(url)
-        data = resp.json()
+        data = upstream.get_json(url)
     except Exception as e:
         print(f"Error fetching or parsing JSON: {e}")
         return
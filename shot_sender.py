@@ -1,4 +1,5 @@
 import requests
+import json
 import serial
 import time
 
@@ -39,9 +40,10 @@ def main():
         return
 
     try:
-        response = requests.get(f"{FLASK_SERVER}/shots/{game_id}")
+        response = requests.get(f"{FLASK_SERVER}/shots/{game_id}", stream=True)
         response.raise_for_status()
-        shots = response.json()
+        # Newline-delimited JSON, one shot per line
+        shots = [json.loads(line) for line in response.iter_lines() if line]
     except Exception as e:
         print(f"Failed to get shots: {e}")
         return
@@ -0,0 +1,169 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from threading import Lock, Event
+
+try:
+    import brotli  # noqa: F401  (urllib3 decodes "br" bodies when brotli is installed)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+DEFAULT_TIMEOUT = (3.05, 10)   # (connect, read) seconds
+
+# Keep-alive connections kept per host. cdn.nba.com carries every live game's
+# play-by-play and boxscore polling, so it gets the largest pool.
+POOL_SIZES = {
+    "https://cdn.nba.com":              32,
+    "https://site.api.espn.com":        8,
+    "https://sports.core.api.espn.com": 8,
+}
+DEFAULT_POOL_SIZE = 4
+
+
+def make_retry():
+    return Retry(
+        total=3,
+        connect=3,
+        read=2,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,          # spread retries so workers don't hit the CDN in lockstep
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False        # hand the last response back so callers can raise_for_status()
+    )
+
+
+def build_session():
+    """
+    One Session shared by every thread. The per-host urllib3 pools behind the
+    adapters are thread-safe, so concurrent workers reuse warm TCP+TLS connections.
+    """
+    session = requests.Session()
+    session.headers.update({
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    default_adapter = HTTPAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE, max_retries=make_retry())
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    for prefix, size in POOL_SIZES.items():
+        session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=make_retry()))
+    return session
+
+
+session = build_session()
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """requests.get() replacement that goes through the pooled, retrying session."""
+    return session.get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+# (kind, url, headers) -> {"done": Event, "result": ..., "error": ...} for fetches in progress
+in_flight = {}
+in_flight_lock = Lock()
+
+
+def single_flight(key, fetch):
+    """
+    Run fetch() once for every concurrent caller with the same key. The first caller
+    does the request; the rest block until it finishes and share its result (or its
+    exception), so a burst of identical requests at tip-off costs one upstream fetch.
+    """
+    with in_flight_lock:
+        call = in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = {"done": Event(), "result": None, "error": None}
+            in_flight[key] = call
+
+    if not leader:
+        call["done"].wait()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    try:
+        call["result"] = fetch()
+        return call["result"]
+    except Exception as e:
+        call["error"] = e
+        raise
+    finally:
+        with in_flight_lock:
+            in_flight.pop(key, None)
+        call["done"].set()
+
+
+def flight_key(kind, url, headers):
+    return (kind, url, tuple(sorted((headers or {}).items())))
+
+
+def get_json(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """GET url as JSON. Concurrent calls for the same URL share one fetch and one parsed body."""
+    def fetch():
+        resp = get(url, headers=headers, timeout=timeout, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    return single_flight(flight_key("get", url, headers), fetch)
+
+
+# url -> {"etag": ..., "last_modified": ..., "data": ...} from the last 200 response
+validators = {}
+validators_lock = Lock()
+
+
+def conditional_get_json(url, headers=None, timeout=DEFAULT_TIMEOUT, cache_body=False):
+    """
+    GET url as JSON, replaying the ETag / Last-Modified validators from the last
+    200 response as If-None-Match / If-Modified-Since.
+    Returns (data, modified). On a 304 modified is False and data is the body parsed
+    on the previous 200 if cache_body was set, otherwise None, so callers can skip
+    re-processing an unchanged document. Concurrent calls for the same URL are
+    coalesced into one request. Returned bodies are shared: don't mutate them.
+    """
+    return single_flight(
+        flight_key("conditional", url, headers),
+        lambda: fetch_conditional(url, headers, timeout, cache_body)
+    )
+
+
+def fetch_conditional(url, headers, timeout, cache_body):
+    request_headers = dict(headers or {})
+    with validators_lock:
+        cached = validators.get(url)
+    if cached:
+        if cached.get("etag"):
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+    resp = get(url, headers=request_headers, timeout=timeout)
+    if resp.status_code == 304 and cached:
+        return cached.get("data"), False
+
+    resp.raise_for_status()
+    data = resp.json()
+
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    with validators_lock:
+        if etag or last_modified:
+            validators[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "data": data if cache_body else None
+            }
+        else:
+            validators.pop(url, None)
+
+    return data, True
+
+
+def forget(url):
+    """Drop stored validators for url so the next fetch is unconditional."""
+    with validators_lock:
+        validators.pop(url, None)